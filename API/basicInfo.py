@@ -1,60 +1,171 @@
 from decimal import Decimal
 import sys
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import pandas as pd
 
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import polygonapi
-from polygon import RESTClient
-from postgresql import execSql
+from polygon.rest.models import TickerDetails
+from httpCache import getJson, DAY
+from postgresql import execSql, execSelectColumns, transaction, invalidateQueryCache
+from polygonBackfill import RateLimiter, REQUESTS_PER_MINUTE
 
 
 def QueryAndInsert(ticker):
     details = QueryCompanyInfo(ticker)
     InsertSql(ticker, details)
 
-def QueryCompanyInfo(ticker):
+def QueryCompanyInfo(ticker, limiter=None):
 
-    client = RESTClient(polygonapi)
-
-    details = client.get_ticker_details(
-        ticker,
-        )
+    # same endpoint as client.get_ticker_details, through the disk cache
+    data = getJson(
+        f"https://api.polygon.io/v3/reference/tickers/{ticker}",
+        params={"apiKey": polygonapi},
+        ttl=DAY,
+        endpoint="polygon_ticker_details",
+        limiter=limiter,
+    )
+    details = TickerDetails.from_dict(data["results"])
     return details
     
-def InsertSql(ticker, details):
-    
-    query = f"""INSERT INTO [stock].[dbo].[CompanyInfo] values (?, ?, ?, ?, ?,
+insertCompanyInfoSql = """INSERT INTO [stock].[dbo].[CompanyInfo] values (?, ?, ?, ?, ?,
                                                                 ?, ?, ?, ?, ?,
                                                                 ?, ?, ?, ?, ?,
                                                                 ?
                                                                 )     """
-        
+
+
+def CompanyInfoValues(ticker, details):
+    return (ticker, 
+            details.name,    
+            details.active,        
+            details.address.city,        
+            details.address.state,     
+            details.currency_name,    
+            datetime.strptime(details.list_date, "%Y-%m-%d"),   
+            details.locale,        
+            details.market,       
+            str(Decimal(details.market_cap)),        
+            details.sic_code,        
+            details.sic_description,     
+            str(Decimal(details.total_employees)),          
+            str(Decimal(details.share_class_shares_outstanding)),        
+            str(Decimal(details.weighted_shares_outstanding)),
+            datetime.now()
+            )    
+
+
+def InsertSql(ticker, details):
+    
+    try:
+        values = CompanyInfoValues(ticker, details)
+        execSql(insertCompanyInfoSql, values, "SqlServer")
+    except Exception as e:
+        print(f"[{ticker}] skipped: {e}")
+
+
+# ---------- batch mode ----------
+MAX_WORKERS = 8
+BATCH_SIZE = 500
+MAX_AGE = timedelta(days=7)
+
+
+def CompanyInfoColumns():
+    """(ticker column, refreshed-at column): CompanyInfo's first and last columns, as InsertSql writes them."""
+    cols = execSelectColumns("SELECT TOP 0 * FROM [stock].[dbo].[CompanyInfo]", "SqlServer").columns
+    return cols[0], cols[-1]
+
+
+def RecentlyRefreshed(maxAge, tickerCol, refreshedCol):
+    df = execSelectColumns(f"""SELECT [{tickerCol}], max([{refreshedCol}]) AS refreshed
+                               FROM [stock].[dbo].[CompanyInfo]
+                               GROUP BY [{tickerCol}]""", "SqlServer")
+    cutoff = pd.Timestamp(datetime.now() - maxAge)
+    return set(df.loc[df["refreshed"] >= cutoff, tickerCol])
+
+
+def FetchValues(ticker, limiter):
+    return CompanyInfoValues(ticker, QueryCompanyInfo(ticker, limiter))
+
+
+def UpsertCompanyInfo(rows, tickerCol):
+    """Replace the CompanyInfo rows of these tickers in one transaction with fast_executemany."""
+    with transaction("SqlServer") as cursor:
+        cursor.fast_executemany = True
+        cursor.executemany(f"DELETE FROM [stock].[dbo].[CompanyInfo] WHERE [{tickerCol}] = ?",
+                           [(row[0],) for row in rows])
+        cursor.executemany(insertCompanyInfoSql, rows)
+    invalidateQueryCache(["CompanyInfo"])
+
+
+def QueryAndInsertMany(tickers, maxAge=MAX_AGE, maxWorkers=MAX_WORKERS, batchSize=BATCH_SIZE,
+                       perMinute=REQUESTS_PER_MINUTE):
+    """Refresh CompanyInfo for many tickers.
+
+    Tickers refreshed within `maxAge` are skipped; the rest are fetched with bounded
+    concurrency over one shared HTTP session, at most `perMinute` requests a minute
+    across workers (disk-cache hits don't count), and upserted in batches. Returns
+    {ticker: error message} for every ticker that failed.
+    """
+    tickerCol, refreshedCol = CompanyInfoColumns()
+    fresh = RecentlyRefreshed(maxAge, tickerCol, refreshedCol) if maxAge else set()
+    todo = [t for t in dict.fromkeys(tickers) if t not in fresh]
+    print(f"{len(todo)} tickers to refresh, {len(tickers) - len(todo)} skipped as fresh")
+
+    limiter = RateLimiter(perMinute)
+    failures = {}
+    batch = []
+    loaded = 0
+    with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+        futures = {pool.submit(FetchValues, t, limiter): t for t in todo}
+        for f in as_completed(futures):
+            ticker = futures[f]
+            try:
+                batch.append(f.result())
+            except Exception as e:
+                failures[ticker] = f"{type(e).__name__}: {e}"
+                continue
+            if len(batch) >= batchSize:
+                loaded += WriteBatch(batch, tickerCol, failures)
+                batch = []
+    if batch:
+        loaded += WriteBatch(batch, tickerCol, failures)
+
+    print(f"loaded {loaded}, failed {len(failures)}")
+    for ticker, error in sorted(failures.items()):
+        print(f"  [{ticker}] {error}")
+    return failures
+
+
+def WriteBatch(batch, tickerCol, failures):
     try:
-        values = (ticker, 
-                details.name,    
-                details.active,        
-                details.address.city,        
-                details.address.state,     
-                details.currency_name,    
-                datetime.strptime(details.list_date, "%Y-%m-%d"),   
-                details.locale,        
-                details.market,       
-                str(Decimal(details.market_cap)),        
-                details.sic_code,        
-                details.sic_description,     
-                str(Decimal(details.total_employees)),          
-                str(Decimal(details.share_class_shares_outstanding)),        
-                str(Decimal(details.weighted_shares_outstanding)),
-                datetime.now()
-                )    
-            
-        execSql(query, values, "SqlServer")
-    except:
-        pass
+        UpsertCompanyInfo(batch, tickerCol)
+        return len(batch)
+    except Exception as e:
+        for row in batch:
+            failures[row[0]] = f"write failed: {e}"
+        return 0
 
 
 if __name__ ==  '__main__':
-    ticker = "TSLA"
-    QueryAndInsert(ticker)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Refresh CompanyInfo from Polygon ticker details")
+    parser.add_argument("file", nargs="?", help="batch refresh: file with one ticker per line")
+    parser.add_argument("--per-minute", type=float, default=REQUESTS_PER_MINUTE,
+                        help="Polygon requests per minute across workers")
+    parser.add_argument("--max-age-days", type=float, default=MAX_AGE.days,
+                        help="skip tickers refreshed more recently than this (0 refreshes all)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            QueryAndInsertMany([line.strip() for line in f if line.strip()],
+                               maxAge=timedelta(days=args.max_age_days), maxWorkers=args.workers,
+                               perMinute=args.per_minute)
+    else:
+        ticker = "TSLA"
+        QueryAndInsert(ticker)
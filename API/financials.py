@@ -2,33 +2,138 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import polygonapi
-from polygon import RESTClient
-
-client = RESTClient(polygonapi)
-
-financials = []
-try:
-    for f in client.vx.list_stock_financials(
-	ticker="AAPL",
-	order="desc",
-	limit="10",
-	sort="filing_date",
-	):
-        financials.append(f)
-except:
-    pass
-
-try:
-    
-    print(len(financials))
-    print(financials[0].company_name)
-
-    sf = financials[0]
-    for attr, value in sf.__dict__.items():
-        print(f"{attr}: {value}")
-
-    for attr, value in sf.financials.balance_sheet.__dict__.items():
-        print(f"{attr}: {value}")
-
-except:
-    pass
+from httpCache import getJson, DAY
+from postgresql import execSql, transaction, invalidateQueryCache
+from sqlCommand import CreateCashflow, AddCashflowFilingDate
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from psycopg2.extras import execute_values
+import argparse
+
+
+FINANCIALS_URL = "https://api.polygon.io/vX/reference/financials"
+MAX_WORKERS = 8
+PAGE_LIMIT = 100
+
+# Polygon cash_flow_statement keys -> cashflow columns. Polygon's standardized
+# statement only carries these totals; the other cashflow columns stay NULL.
+CASHFLOW_FIELDS = {
+    "net_cash_flow": "Changes_In_Cash",
+    "net_cash_flow_from_operating_activities": "Operating_Cash_Flow",
+    "net_cash_flow_from_operating_activities_continuing": "Cash_Flow_From_Continuing_Operating_Activities",
+    "net_cash_flow_from_investing_activities": "Investing_Cash_Flow",
+    "net_cash_flow_from_investing_activities_continuing": "Cash_Flow_From_Continuing_Investing_Activities",
+    "net_cash_flow_from_financing_activities": "Financing_Cash_Flow",
+    "net_cash_flow_from_financing_activities_continuing": "Cash_Flow_From_Continuing_Financing_Activities",
+}
+COLUMNS = list(CASHFLOW_FIELDS.values())
+
+
+def lastFilingDates(tickers):
+    """Latest stored filing date per ticker; filings filed on or before it are already loaded."""
+    with transaction("PostgreSql") as cur:
+        cur.execute("SELECT stock_id, max(filing_date) FROM cashflow WHERE stock_id = ANY(%s) GROUP BY stock_id",
+                    (list(tickers),))
+        return {ticker: filed for ticker, filed in cur.fetchall() if filed is not None}
+
+
+def listFilings(ticker, filedAfter=None, timeframe="quarterly"):
+    """Yield raw filings for `ticker`, oldest first, paging through next_url."""
+    url = FINANCIALS_URL
+    params = {"ticker": ticker, "timeframe": timeframe, "order": "asc", "sort": "filing_date",
+              "limit": PAGE_LIMIT, "filing_date.gt": filedAfter, "apiKey": polygonapi}
+    while url:
+        page = getJson(url, params=params, ttl=DAY, endpoint="polygon_financials")
+        yield from page.get("results", [])
+        url = page.get("next_url")
+        params = {"apiKey": polygonapi}  # next_url already carries the query and cursor
+
+
+def flattenCashflow(ticker, filings):
+    """Columnar arrays for the cashflow table, one entry per filing with a cash-flow section."""
+    cols = {"stock_id": [], "date": [], "filing_date": [], **{c: [] for c in COLUMNS}}
+    for f in filings:
+        statement = f.get("financials", {}).get("cash_flow_statement")
+        if not statement or not f.get("end_date"):
+            continue
+        cols["stock_id"].append(ticker)
+        cols["date"].append(f["end_date"])
+        cols["filing_date"].append(f.get("filing_date"))
+        for key, column in CASHFLOW_FIELDS.items():
+            cols[column].append(statement.get(key, {}).get("value"))
+    return cols
+
+
+def latestFilings(cols):
+    """One row per (stock_id, date): amendments restate a period, so the latest filing wins."""
+    latest = {}
+    for row in zip(*(cols[c] for c in ["stock_id", "date", "filing_date"] + COLUMNS)):
+        current = latest.get(row[:2])
+        if current is None or (row[2] or "") >= (current[2] or ""):
+            latest[row[:2]] = row
+    return list(latest.values())
+
+
+def upsertCashflow(cols):
+    rows = latestFilings(cols)
+    if not rows:
+        return 0
+    quoted = ", ".join(f'"{c}"' for c in COLUMNS)
+    updates = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in ["filing_date"] + COLUMNS)
+    with transaction("PostgreSql") as cur:
+        execute_values(cur, f"""INSERT INTO cashflow (stock_id, date, filing_date, {quoted}) VALUES %s
+                                ON CONFLICT (stock_id, date) DO UPDATE SET {updates}
+                                WHERE cashflow.filing_date IS NULL OR EXCLUDED.filing_date >= cashflow.filing_date""",
+                       rows, page_size=1000)
+    invalidateQueryCache(["cashflow"])
+    return len(rows)
+
+
+def fetchTicker(ticker, filedAfter, timeframe):
+    return flattenCashflow(ticker, listFilings(ticker, filedAfter, timeframe))
+
+
+def ingestCashflow(tickers, timeframe="quarterly", maxWorkers=MAX_WORKERS):
+    """Load new cash-flow filings for many tickers concurrently and upsert them in one batch.
+
+    Only quarterly or annual filings are loaded per run: both would land on the same
+    (stock_id, date) for a fiscal year end.
+    """
+    execSql(CreateCashflow, type="PostgreSql")
+    execSql(AddCashflowFilingDate, type="PostgreSql")
+    last = lastFilingDates(tickers)
+
+    merged = {"stock_id": [], "date": [], "filing_date": [], **{c: [] for c in COLUMNS}}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+        futures = {pool.submit(fetchTicker, t, last.get(t) and last[t].isoformat(), timeframe): t
+                   for t in tickers}
+        for f in as_completed(futures):
+            ticker = futures[f]
+            try:
+                cols = f.result()
+            except Exception as e:
+                failures[ticker] = f"{type(e).__name__}: {e}"
+                continue
+            for c, values in cols.items():
+                merged[c].extend(values)
+
+    loaded = upsertCashflow(merged)
+    print(f"upserted {loaded} filings for {len(tickers) - len(failures)} tickers")
+    for ticker, error in sorted(failures.items()):
+        print(f"  [{ticker}] {error}")
+    return loaded, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load Polygon cash-flow statements into cashflow")
+    parser.add_argument("tickers", nargs="*", default=["AAPL"])
+    parser.add_argument("--file", help="file with one ticker per line")
+    parser.add_argument("--timeframe", choices=["quarterly", "annual"], default="quarterly")
+    args = parser.parse_args()
+
+    tickers = args.tickers
+    if args.file:
+        with open(args.file) as f:
+            tickers = [line.strip() for line in f if line.strip()]
+    ingestCashflow(tickers, args.timeframe)
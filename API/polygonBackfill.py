@@ -0,0 +1,194 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import polygonapi
+from polygon import RESTClient
+from postgresql import upsertStockPrice
+from stockPartitions import ensureStockPricePartitions, monthStart
+from barStore import BarStore
+from tradingCalendar import getCalendar
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import argparse
+import datetime
+import json
+import time
+
+import pandas as pd
+
+
+CHUNK_DAYS = 30             # ~30 days of minute bars fits in one 50000-row page
+PAGE_LIMIT = 50_000         # bars per list_aggs page; each page is one request
+FLUSH_ROWS = 10_000         # bars buffered per chunk before handing them to the sink
+REQUESTS_PER_MINUTE = 5     # free plan; raise for paid plans
+MAX_WORKERS = 4
+CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backfill_checkpoint.jsonl")
+
+barStore = BarStore()
+
+
+class RateLimiter:
+    """Spaces calls evenly so that at most `perMinute` start in any minute, across threads."""
+
+    def __init__(self, perMinute):
+        self.interval = 60.0 / perMinute
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(max(0.0, start - now))
+
+
+class Checkpoint:
+    """Append-only log of finished chunks; re-running skips everything in it."""
+
+    def __init__(self, path=CHECKPOINT):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.done.add(chunkKey(entry["symbol"], entry["from"], entry["to"], entry["timespan"]))
+
+    def mark(self, symbol, start, end, timespan, rows):
+        entry = {"symbol": symbol, "from": str(start), "to": str(end), "timespan": timespan,
+                 "rows": rows, "at": datetime.datetime.now().isoformat(timespec="seconds")}
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            self.done.add(chunkKey(symbol, start, end, timespan))
+
+
+def chunkKey(symbol, start, end, timespan):
+    return (symbol, str(start), str(end), timespan)
+
+
+def splitRange(start, end, days=CHUNK_DAYS):
+    """[start, end] as consecutive, non-overlapping (from, to) date pairs of at most `days` days."""
+    chunks = []
+    cursor = start
+    while cursor <= end:
+        stop = min(cursor + datetime.timedelta(days=days - 1), end)
+        chunks.append((cursor, stop))
+        cursor = stop + datetime.timedelta(days=1)
+    return chunks
+
+
+def toFrame(aggs):
+    df = pd.DataFrame(
+        {"open": [a.open for a in aggs], "high": [a.high for a in aggs], "low": [a.low for a in aggs],
+         "close": [a.close for a in aggs], "volume": [a.volume for a in aggs]},
+        index=pd.to_datetime([a.timestamp for a in aggs], unit="ms", utc=True),
+    )
+    # stockPrice / fetch_data bars are naive US/Eastern
+    df.index = df.index.tz_convert("America/New_York").tz_localize(None)
+    return df
+
+
+_partitionsFrom = None       # earliest month stockPrice partitions were ensured from in this process
+_partitionsLock = threading.Lock()
+
+
+def ensurePartitionsFrom(day):
+    """Create stockPrice partitions from `day`'s month onward, unless an earlier month already did."""
+    global _partitionsFrom
+    month = monthStart(day)
+    with _partitionsLock:
+        if _partitionsFrom is None or month < _partitionsFrom:
+            ensureStockPricePartitions(start=month)
+            _partitionsFrom = month
+
+
+def dbSink(symbol, df):
+    # backfilled months usually predate the partitions the scheduler keeps ahead of today
+    ensurePartitionsFrom(df.index.min().date())
+    upsertStockPrice(df, symbol)
+
+
+def storeSink(symbol, df):
+    barStore.append(symbol, df)
+
+
+def fetchChunk(client, limiter, symbol, start, end, timespan, sink):
+    """Stream one chunk's bars into `sink` in FLUSH_ROWS batches; returns rows written.
+
+    list_aggs fetches the next page lazily once PAGE_LIMIT bars have been read, so the
+    limiter is waited on before the first page and again after every full page.
+    """
+    limiter.wait()
+    rows = 0
+    buffer = []
+    for i, agg in enumerate(client.list_aggs(ticker=symbol, multiplier=1, timespan=timespan,
+                                             from_=str(start), to=str(end), limit=PAGE_LIMIT), 1):
+        buffer.append(agg)
+        if len(buffer) >= FLUSH_ROWS:
+            sink(symbol, toFrame(buffer))
+            rows += len(buffer)
+            buffer = []
+        if i % PAGE_LIMIT == 0:
+            limiter.wait()
+    if buffer:
+        sink(symbol, toFrame(buffer))
+        rows += len(buffer)
+    return rows
+
+
+def backfill(symbols, start, end, timespan="minute", sink=dbSink, checkpoint=None,
+             maxWorkers=MAX_WORKERS, perMinute=REQUESTS_PER_MINUTE, chunkDays=CHUNK_DAYS, exchange="XNYS"):
+    """Fetch `symbols` over [start, end] in date chunks, concurrently and within the rate limit.
+
+    Finished chunks are logged to `checkpoint`, so an interrupted run resumes where it stopped.
+    """
+    checkpoint = checkpoint or Checkpoint()
+    client = RESTClient(polygonapi)
+    limiter = RateLimiter(perMinute)
+
+    # chunks with no trading session (holiday weekends, short ranges) would only burn quota
+    calendar = getCalendar(exchange)
+    chunks = [(a, b) for a, b in splitRange(start, end, chunkDays) if len(calendar.sessionsBetween(a, b))]
+    todo = [(s, a, b) for s in symbols for a, b in chunks
+            if chunkKey(s, a, b, timespan) not in checkpoint.done]
+    print(f"{len(todo)} chunks to fetch ({len(checkpoint.done)} already done)")
+
+    total, failed = 0, []
+    with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+        futures = {pool.submit(fetchChunk, client, limiter, s, a, b, timespan, sink): (s, a, b) for s, a, b in todo}
+        for f in as_completed(futures):
+            s, a, b = futures[f]
+            try:
+                rows = f.result()
+            except Exception as e:
+                print(f"[{s} {a}..{b}] failed: {e}")
+                failed.append((s, a, b))
+                continue
+            checkpoint.mark(s, a, b, timespan, rows)
+            total += rows
+            print(f"[{s} {a}..{b}] {rows} bars")
+
+    print(f"done: {total} bars, {len(failed)} chunks failed (re-run to retry them)")
+    return total, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Resumable Polygon aggregate backfill")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--from", dest="start", required=True, type=datetime.date.fromisoformat)
+    parser.add_argument("--to", dest="end", default=datetime.date.today(), type=datetime.date.fromisoformat)
+    parser.add_argument("--timespan", default="minute")
+    parser.add_argument("--sink", choices=["db", "store"], default="db")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--per-minute", type=int, default=REQUESTS_PER_MINUTE)
+    parser.add_argument("--checkpoint", default=CHECKPOINT)
+    args = parser.parse_args()
+
+    backfill(args.symbols, args.start, args.end, args.timespan,
+             sink=dbSink if args.sink == "db" else storeSink,
+             checkpoint=Checkpoint(args.checkpoint),
+             maxWorkers=args.workers, perMinute=args.per_minute)
@@ -0,0 +1,229 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import polygonapi
+from postgresql import execSql, copyRows
+from sqlCommand import createStockTrade, createStockQuote
+
+from zoneinfo import ZoneInfo
+import argparse
+import asyncio
+import datetime
+import json
+import time
+
+import websockets
+
+
+POLYGON_WS = "wss://socket.polygon.io/stocks"
+FLUSH_ROWS = 5_000          # flush once this many events are buffered ...
+FLUSH_SECONDS = 1.0         # ... or this long after the oldest buffered event
+MAX_PENDING_BATCHES = 4     # batches waiting on the writer before the reader stops reading
+RECONNECT_SECONDS = 5.0
+
+TRADE_COLUMNS = ["stock_id", "ts", "price", "size", "exchange", "trade_id"]
+QUOTE_COLUMNS = ["stock_id", "ts", "bid", "bid_size", "ask", "ask_size"]
+
+_eastern = ZoneInfo("America/New_York")
+
+
+class AuthFailed(Exception):
+    """The server rejected the API key; not an OSError, so stream() does not reconnect on it."""
+
+
+def toTimestamp(ms):
+    # stored like stockPrice: naive US/Eastern
+    return datetime.datetime.fromtimestamp(ms / 1000, _eastern).replace(tzinfo=None)
+
+
+def tradeRow(ev):
+    return (ev["sym"], toTimestamp(ev["t"]), ev["p"], ev.get("s"), ev.get("x"), ev.get("i"))
+
+
+def quoteRow(ev):
+    return (ev["sym"], toTimestamp(ev["t"]), ev.get("bp"), ev.get("bs"), ev.get("ap"), ev.get("as"))
+
+
+class MicroBatcher:
+    """Buffers events per symbol and hands them to the writer in micro-batches.
+
+    A batch is cut when FLUSH_ROWS events are buffered or FLUSH_SECONDS have passed
+    since the oldest one. Handing off awaits a bounded queue, so when the writer
+    falls behind the reader stops pulling frames off the socket (backpressure).
+    """
+
+    def __init__(self, queue, maxRows=FLUSH_ROWS, maxSeconds=FLUSH_SECONDS):
+        self.queue = queue
+        self.maxRows = maxRows
+        self.maxSeconds = maxSeconds
+        self.buffers = {"T": {}, "Q": {}}
+        self.rows = 0
+        self.oldest = None
+        self.stats = {"events": 0, "batches": 0, "blocked": 0.0}
+
+    async def add(self, ev):
+        kind = ev.get("ev")
+        if kind not in self.buffers:
+            return
+        self.buffers[kind].setdefault(ev["sym"], []).append(ev)
+        self.rows += 1
+        self.stats["events"] += 1
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+        if self.rows >= self.maxRows:
+            await self.flush()
+
+    async def flush(self):
+        if not self.rows:
+            return
+        batch, self.buffers = self.buffers, {"T": {}, "Q": {}}
+        self.rows, self.oldest = 0, None
+
+        start = time.monotonic()
+        await self.queue.put(batch)
+        self.stats["blocked"] += time.monotonic() - start
+        self.stats["batches"] += 1
+
+    async def timer(self):
+        while True:
+            await asyncio.sleep(self.maxSeconds / 4)
+            if self.oldest is not None and time.monotonic() - self.oldest >= self.maxSeconds:
+                await self.flush()
+
+
+def writeBatch(batch):
+    trades = [tradeRow(ev) for events in batch["T"].values() for ev in events]
+    quotes = [quoteRow(ev) for events in batch["Q"].values() for ev in events]
+    return copyRows("stockTrade", TRADE_COLUMNS, trades) + copyRows("stockQuote", QUOTE_COLUMNS, quotes)
+
+
+async def writer(queue, stats):
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = await queue.get()
+        try:
+            if batch is None:
+                return
+            stats["written"] += await loop.run_in_executor(None, writeBatch, batch)
+        except Exception as e:
+            print(f"[writer] batch failed: {e}")
+            stats["failedBatches"] += 1
+        finally:
+            queue.task_done()
+
+
+async def consume(url, symbols, batcher, apiKey=polygonapi, recordPath=None):
+    """Read one websocket session into `batcher`; returns when the server closes it."""
+    record = open(recordPath, "a", encoding="utf-8") if recordPath else None
+    try:
+        async with websockets.connect(url, max_queue=16) as ws:
+            await ws.send(json.dumps({"action": "auth", "params": apiKey}))
+            params = ",".join(f"{kind}.{s}" for s in symbols for kind in ("T", "Q"))
+            await ws.send(json.dumps({"action": "subscribe", "params": params}))
+
+            async for frame in ws:
+                try:
+                    events = json.loads(frame)
+                except ValueError:
+                    events = None
+                if not isinstance(events, list):
+                    print(f"[ws] skipped malformed frame: {frame[:80]!r}")
+                    continue
+                if record:
+                    record.write(frame + "\n")
+                for ev in events:
+                    if ev.get("ev") == "status":
+                        print(f"[ws] {ev.get('status')}: {ev.get('message', '')}")
+                        if ev.get("status") == "auth_failed":
+                            raise AuthFailed(ev.get("message"))
+                    else:
+                        await batcher.add(ev)
+    finally:
+        if record:
+            record.close()
+
+
+async def stream(symbols, url=POLYGON_WS, reconnect=True, recordPath=None,
+                 maxRows=FLUSH_ROWS, maxSeconds=FLUSH_SECONDS):
+    """Stream trades and quotes for `symbols` into stockTrade / stockQuote until cancelled.
+
+    With reconnect=False (replay) it returns once the feed ends and everything is written.
+    """
+    execSql(createStockTrade, type="PostgreSql")
+    execSql(createStockQuote, type="PostgreSql")
+
+    queue = asyncio.Queue(maxsize=MAX_PENDING_BATCHES)
+    batcher = MicroBatcher(queue, maxRows, maxSeconds)
+    stats = {"written": 0, "failedBatches": 0}
+    writerTask = asyncio.create_task(writer(queue, stats))
+    timerTask = asyncio.create_task(batcher.timer())
+
+    try:
+        while True:
+            try:
+                await consume(url, symbols, batcher, recordPath=recordPath)
+            except (OSError, websockets.WebSocketException) as e:
+                # dropped connections and failed (re)handshakes alike, e.g. an HTTP 5xx from the gateway
+                print(f"[ws] disconnected: {type(e).__name__}: {e}")
+            if not reconnect:
+                break
+            await asyncio.sleep(RECONNECT_SECONDS)
+    finally:
+        timerTask.cancel()
+        await batcher.flush()
+        await queue.put(None)
+        await writerTask
+
+    summary = {**batcher.stats, **stats}
+    print(f"events {summary['events']}, rows written {summary['written']}, batches {summary['batches']}, "
+          f"reader blocked {summary['blocked']:.2f}s, failed batches {summary['failedBatches']}")
+    return summary
+
+
+# ---------- local replay server ----------
+async def serveReplay(path, host="localhost", port=8765, rate=None):
+    """Serve frames recorded with --record over a Polygon-style websocket handshake.
+
+    `rate` caps frames per second; None sends as fast as the client reads.
+    """
+    async def handler(ws, *_):
+        await ws.send(json.dumps([{"ev": "status", "status": "connected", "message": "Connected Successfully"}]))
+        await ws.recv()  # auth
+        await ws.send(json.dumps([{"ev": "status", "status": "auth_success", "message": "authenticated"}]))
+        subscribe = json.loads(await ws.recv())
+        wanted = {p.split(".", 1)[1] for p in subscribe.get("params", "").split(",") if "." in p}
+
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                events = [ev for ev in json.loads(line) if ev.get("sym") in wanted or ev.get("ev") == "status"]
+                if events:
+                    await ws.send(json.dumps(events))
+                    if rate:
+                        await asyncio.sleep(1 / rate)
+        await ws.close()
+
+    async with websockets.serve(handler, host, port):
+        print(f"replaying {path} on ws://{host}:{port}")
+        await asyncio.Future()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Polygon trade/quote streaming ingestion")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    live = sub.add_parser("stream", help="ingest a live (or replayed) feed")
+    live.add_argument("symbols", nargs="+")
+    live.add_argument("--url", default=POLYGON_WS)
+    live.add_argument("--record", help="append raw frames to this file for later replay")
+    live.add_argument("--once", action="store_true", help="stop when the feed ends instead of reconnecting")
+
+    replay = sub.add_parser("replay", help="serve a recorded feed locally")
+    replay.add_argument("path")
+    replay.add_argument("--port", type=int, default=8765)
+    replay.add_argument("--rate", type=float, help="frames per second")
+
+    args = parser.parse_args()
+    if args.command == "stream":
+        asyncio.run(stream(args.symbols, args.url, reconnect=not args.once, recordPath=args.record))
+    else:
+        asyncio.run(serveReplay(args.path, port=args.port, rate=args.rate))
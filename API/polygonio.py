@@ -5,29 +5,28 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import polygonapi
 import requests
 
-from polygon import RESTClient
-import datetime
+from polygon.rest.models import DailyOpenCloseAgg
+from httpCache import getJson, NEVER, DAY
+from tradingCalendar import getCalendar
 
 
 
-def GetLatestDaily(ticker:str):
+def GetLatestDaily(ticker:str, adjusted=True):
 
+    # last session whose close has passed (holidays, early closes and weekends included)
+    LastOpenDate = getCalendar("XNYS").lastCompletedSession()
 
-    client = RESTClient(polygonapi)
-
-    today = LastOpenDate = datetime.datetime.now()
-    weekday = today.strftime("%w")
-
-    if weekday in ("0","6"): # Saturdat, Sunday
-        LastOpenDate  = today +  datetime.timedelta(days=-2) if weekday == 0 else today +  datetime.timedelta(days=-1) # if weekday in ("0","6") else today
-
-    request = client.get_daily_open_close_agg(
-        ticker,
-        f"{LastOpenDate.strftime("%Y-%m-%d")}",
-        adjusted="true",
+    # same endpoint as client.get_daily_open_close_agg, through the disk cache:
+    # a completed session's raw bar never changes, but adjusted bars are restated
+    # after splits and dividends
+    data = getJson(
+        f"https://api.polygon.io/v1/open-close/{ticker}/{LastOpenDate:%Y-%m-%d}",
+        params={"adjusted": "true" if adjusted else "false", "apiKey": polygonapi},
+        ttl=DAY if adjusted else NEVER,
+        endpoint="polygon_open_close",
     )
 
-    return request
+    return DailyOpenCloseAgg.from_dict(data)
 
 if __name__ ==  '__main__':
     tick = "AAPL"
@@ -1,53 +1,124 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-
-
-df = pd.read_csv(r'C:\\Users\\dwade\\Downloads\\AbTest.csv')
-
-print(df.head())
-
-df['DATE'] = pd.to_datetime(df['VDATE'])
-
-# Basic summary
-print(df['LandingPage'].value_counts())
-print(df['Convert'].value_counts())
-print(df.head())
-
-
-# Subset to smartphone users only
-# if we want to compare 3+ pages, we need to use chi-square
-ab_df = df[(df['Channel'] == 'smartphone') & 
-           (df['LandingPage'].isin(['Mobile_1', 'Mobile_2']))]
-
-# Check counts
-ab_df['LandingPage'].value_counts()
-
-
-# Subset to smartphone users only
-ab_df = df[(df['LandingPage'].isin(['Mobile_1', 'Mobile_2']))]
-
-# Check counts
-ab_df['LandingPage'].value_counts()
+import argparse
+import itertools
 
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency
 from statsmodels.stats.proportion import proportions_ztest
-
-ab_summary = ab_df.groupby('LandingPage')['Convert'].agg(['sum', 'count'])
-print(ab_summary)
-
-# Convert to required format
-successes = ab_summary['sum'].values
-samples = ab_summary['count'].values
-
-z_stat, p_val = proportions_ztest(count=successes, nobs=samples, alternative='two-sided')
-
-print(f"Z-stat: {z_stat:.4f}, P-value: {p_val:.4f}")
-
-if p_val < 0.05:
-    print("✅ Statistically significant difference between landing pages.")
-else:
-    print("❌ No statistically significant difference.")
-
-
-
-
-
+from statsmodels.stats.multitest import multipletests
+
+
+CHUNK_ROWS = 1_000_000
+KEYS = ['LandingPage', 'Channel', 'VDATE']
+
+
+def sufficientStats(path=r'C:\\Users\\dwade\\Downloads\\AbTest.csv', chunksize=CHUNK_ROWS):
+    """Stream the event log and keep only conversions and exposures per variant, channel and day.
+
+    Each chunk is read with categorical dtypes and reduced to its group counts, so
+    memory is bounded by the number of (variant, channel, day) cells, not rows.
+    VDATE is parsed once per distinct value at the end instead of once per row.
+    """
+    parts = []
+    reader = pd.read_csv(path, usecols=KEYS + ['Convert'], chunksize=chunksize,
+                         dtype={'LandingPage': 'category', 'Channel': 'category', 'VDATE': 'category'})
+    for chunk in reader:
+        parts.append(chunk.groupby(KEYS, observed=True)['Convert'].agg(conversions='sum', exposures='count'))
+        # fold partial aggregates regularly so the list never grows with the file
+        if len(parts) >= 16:
+            parts = [pd.concat(parts).groupby(level=KEYS).sum()]
+
+    stats = pd.concat(parts).groupby(level=KEYS).sum().reset_index()
+    days = {v: d for v, d in zip(stats['VDATE'].unique(), pd.to_datetime(stats['VDATE'].unique()))}
+    stats['day'] = stats['VDATE'].map(days).dt.normalize()
+    stats = stats.groupby(['LandingPage', 'Channel', 'day'], observed=True)[['conversions', 'exposures']].sum()
+    return stats.reset_index()
+
+
+def _filter(stats, variants=None, channels=None, start=None, end=None):
+    mask = np.ones(len(stats), dtype=bool)
+    if variants is not None:
+        mask &= stats['LandingPage'].isin(variants).to_numpy()
+    if channels is not None:
+        mask &= stats['Channel'].isin(channels).to_numpy()
+    if start is not None:
+        mask &= (stats['day'] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (stats['day'] <= pd.Timestamp(end)).to_numpy()
+    return stats[mask]
+
+
+def summary(stats, by='LandingPage', **cut):
+    s = _filter(stats, **cut).groupby(by, observed=True)[['conversions', 'exposures']].sum()
+    s = s[s['exposures'] > 0]
+    s['rate'] = s['conversions'] / s['exposures']
+    return s
+
+
+def pairwiseTests(stats, alpha=0.05, **cut):
+    """Two-sided z-test for every pair of variants, Holm-adjusted for the number of pairs."""
+    s = summary(stats, **cut)
+    rows = []
+    for a, b in itertools.combinations(s.index, 2):
+        z, p = proportions_ztest(count=s.loc[[a, b], 'conversions'].to_numpy(),
+                                 nobs=s.loc[[a, b], 'exposures'].to_numpy(), alternative='two-sided')
+        rows.append({'a': a, 'b': b, 'rate_a': s.at[a, 'rate'], 'rate_b': s.at[b, 'rate'],
+                     'lift': s.at[b, 'rate'] / s.at[a, 'rate'] - 1 if s.at[a, 'rate'] else np.nan,
+                     'z': z, 'p': p})
+    result = pd.DataFrame(rows)
+    if not result.empty:
+        result['significant'], result['p_holm'] = multipletests(result['p'], alpha=alpha, method='holm')[:2]
+    return result
+
+
+def omnibus(stats, **cut):
+    """Chi-square test of independence between variant and conversion (any number of variants)."""
+    s = summary(stats, **cut)
+    if len(s) < 2:
+        return {'chi2': np.nan, 'p': np.nan, 'dof': 0, 'variants': len(s)}
+    table = np.column_stack([s['conversions'], s['exposures'] - s['conversions']])
+    chi2, p, dof, _ = chi2_contingency(table)
+    return {'chi2': chi2, 'p': p, 'dof': dof, 'variants': len(s)}
+
+
+def segmentBreakdown(stats, segment='Channel', **cut):
+    """Per-segment conversion rates by variant plus each segment's chi-square omnibus."""
+    rows = []
+    for value in _filter(stats, **cut)[segment].unique():
+        seg = stats[stats[segment] == value]
+        test = omnibus(seg, **cut)
+        for variant, r in summary(seg, **cut).iterrows():
+            rows.append({segment: value, 'LandingPage': variant, **r.to_dict(),
+                         'chi2': test['chi2'], 'p': test['p']})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Chunked multi-variant A/B analysis")
+    parser.add_argument('--input', default=r'C:\\Users\\dwade\\Downloads\\AbTest.csv')
+    parser.add_argument('--stats', help="parquet file of sufficient statistics; built from --input if missing")
+    parser.add_argument('--variants', nargs='+', help="e.g. Mobile_1 Mobile_2")
+    parser.add_argument('--channels', nargs='+', help="e.g. smartphone")
+    args = parser.parse_args()
+
+    try:
+        stats = pd.read_parquet(args.stats) if args.stats else None
+    except FileNotFoundError:
+        stats = None
+    if stats is None:
+        stats = sufficientStats(args.input)
+        if args.stats:
+            stats.to_parquet(args.stats, index=False)  # re-cut later without re-reading the log
+
+    cut = {'variants': args.variants, 'channels': args.channels}
+    print(summary(stats, **cut))
+    print(pairwiseTests(stats, **cut))
+
+    test = omnibus(stats, **cut)
+    print(f"Chi2: {test['chi2']:.4f}, dof: {test['dof']}, P-value: {test['p']:.4f}")
+    if test['p'] < 0.05:
+        print("✅ Statistically significant difference between landing pages.")
+    else:
+        print("❌ No statistically significant difference.")
+
+    print(segmentBreakdown(stats, **cut))
@@ -0,0 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+
+SINA_URL = "http://hq.sinajs.cn/list="
+HEADERS = {
+    'Referer': 'https://finance.sina.com.cn/',
+    'User-Agent': 'Mozilla/5.0'
+}
+CODES_PER_REQUEST = 500     # the endpoint takes comma-separated codes; keep the URL well under 8KB
+POLL_SECONDS = 1.0
+MAX_WORKERS = 8
+TIMEOUT = 5
+
+FIELDS = ['price', 'open', 'prevClose', 'high', 'low', 'volume', 'amount']
+
+# field positions in the quoted, comma-separated payload
+#   A-share (sh/sz): name,open,prevClose,price,high,low,bid,ask,volume,amount,...
+#   HK (hk):         enName,cnName,open,prevClose,high,low,price,change,pct,bid,ask,amount,volume,...
+_LAYOUT = {
+    'sh': {'price': 3, 'open': 1, 'prevClose': 2, 'high': 4, 'low': 5, 'volume': 8, 'amount': 9},
+    'sz': {'price': 3, 'open': 1, 'prevClose': 2, 'high': 4, 'low': 5, 'volume': 8, 'amount': 9},
+    'hk': {'price': 6, 'open': 2, 'prevClose': 3, 'high': 4, 'low': 5, 'volume': 12, 'amount': 11},
+}
+_NAME = {'sh': 0, 'sz': 0, 'hk': 1}
+
+
+def make_session(pool=MAX_WORKERS):
+    s = requests.Session()
+    s.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool)
+    s.mount('http://', adapter)
+    s.mount('https://', adapter)
+    return s
+
+
+class QuotePoller:
+    """Polls Sina hq quotes for many codes, hundreds per request, and reports only changes.
+
+    Quotes live in one float64 array per field, indexed by the code's position in
+    `codes`; a poll fills `current`, compares it against the previous poll and hands
+    the changed rows to `onChange(codes, names, quotes)`.
+    """
+
+    def __init__(self, codes, onChange=None, perRequest=CODES_PER_REQUEST, maxWorkers=MAX_WORKERS):
+        self.codes = list(dict.fromkeys(codes))
+        self.index = {c: i for i, c in enumerate(self.codes)}
+        self.batches = [self.codes[i:i + perRequest] for i in range(0, len(self.codes), perRequest)]
+        self.onChange = onChange or print_changes
+        self.session = make_session(maxWorkers)
+        self.pool = ThreadPoolExecutor(max_workers=maxWorkers)
+        self.names = np.full(len(self.codes), '', dtype=object)
+        self.current = {f: np.full(len(self.codes), np.nan) for f in FIELDS}
+        self.previous = {f: np.full(len(self.codes), np.nan) for f in FIELDS}
+
+    def fetch(self, batch):
+        response = self.session.get(SINA_URL + ",".join(batch), timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.content.decode('gbk', errors='replace')
+
+    def parse(self, text):
+        # var hq_str_sh600000="浦发银行,10.350,10.340,10.420,...";
+        current, index, names = self.current, self.index, self.names
+        for line in text.split(';'):
+            start = line.find('hq_str_')
+            if start < 0:
+                continue
+            eq = line.find('=', start)
+            code = line[start + 7:eq]
+            i = index.get(code)
+            if i is None:
+                continue
+            info = line[eq + 2:line.rfind('"')].split(',')
+            layout = _LAYOUT.get(code[:2])
+            if layout is None or len(info) <= max(layout.values()):
+                continue  # unknown market, suspended or delisted code
+            names[i] = info[_NAME[code[:2]]]
+            for field, pos in layout.items():
+                try:
+                    current[field][i] = float(info[pos])
+                except ValueError:
+                    current[field][i] = np.nan
+
+    def poll(self):
+        """One round over every code; returns the positions whose quote changed."""
+        for text in self.pool.map(self.fetch, self.batches):
+            self.parse(text)
+
+        changed = np.zeros(len(self.codes), dtype=bool)
+        for f in ('price', 'volume', 'high', 'low'):
+            cur, prev = self.current[f], self.previous[f]
+            changed |= (cur != prev) & ~(np.isnan(cur) & np.isnan(prev))
+
+        positions = np.flatnonzero(changed)
+        if len(positions):
+            self.onChange([self.codes[i] for i in positions], self.names[positions],
+                          {f: self.current[f][positions] for f in FIELDS})
+        for f in FIELDS:
+            self.previous[f][:] = self.current[f]
+        return positions
+
+    def run(self, every=POLL_SECONDS, rounds=None):
+        """Poll on a fixed cadence (start-to-start), skipping ahead if a round overruns."""
+        next_at = time.monotonic()
+        done = 0
+        while rounds is None or done < rounds:
+            try:
+                self.poll()
+            except requests.RequestException as e:
+                print(f"[poll] failed: {e}")
+            done += 1
+            next_at += every
+            now = time.monotonic()
+            if next_at < now:
+                next_at = now
+            time.sleep(next_at - now)
+
+    def close(self):
+        self.pool.shutdown()
+        self.session.close()
+
+
+def print_changes(codes, names, quotes):
+    for i, code in enumerate(codes):
+        print(f"{code}: {names[i]} - {quotes['price'][i]}")
+
+
+if __name__ == '__main__':
+    poller = QuotePoller(["sh600000", "sz000001", "hk00700"])
+    try:
+        poller.run(rounds=5)
+    finally:
+        poller.close()
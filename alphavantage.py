@@ -1,11 +1,25 @@
-import requests
+import warnings
+
 import pandas as pd
+from httpCache import getJson, MINUTE
+
+SERIES_KEY = 'Time Series (1min)'
+
+def fetch_data(symbol='SNOW', store=None, start=None, end=None, outputsize='compact', **kwargs):
+    """Latest intraday 1min bars for `symbol`: the last 100 ('compact') or the trailing month ('full').
 
-def fetch_data(symbol='SNOW', **kwargs):
-    url = f'https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={symbol}&interval=1min&apikey=xx'
-    response = requests.get(url)
-    data = response.json()
-    df = pd.DataFrame.from_dict(data['Time Series (1min)'], orient='index')
+    With a barStore.BarStore as `store`, reads through it: the API is only asked for
+    bars newer than what is stored, those are appended, and the stored range
+    [start, end] is served locally.
+    """
+    if store is not None:
+        return _fetch_through_store(symbol, store, start, end)
+
+    url = f'https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={symbol}&interval=1min&outputsize={outputsize}&apikey=xx'
+    # the latest compact window moves every minute; rate-limit notices are never cached
+    data = getJson(url, ttl=MINUTE, endpoint="alphavantage_intraday",
+                   validate=lambda body: SERIES_KEY in body)
+    df = pd.DataFrame.from_dict(data[SERIES_KEY], orient='index')
     df.index = pd.to_datetime(df.index)
     df.columns = ['open', 'high', 'low', 'close', 'volume']
     df = df.astype(float)
@@ -13,8 +27,32 @@ def fetch_data(symbol='SNOW', **kwargs):
     # Store result in XCom
     # kwargs['ti'].xcom_push(key='fetched_df', value=df.to_json())
     return df
+
+
+def _fetch_through_store(symbol, store, start, end):
+    last = store.lastTimestamp(symbol)
+    if last is None or end is None or pd.Timestamp(end) > last:
+        latest = fetch_data(symbol)
+        if last is None or latest.index.min() > last:
+            # the gap is wider than the compact window
+            latest = fetch_data(symbol, outputsize='full')
+            if last is not None and latest.index.min() > last:
+                warnings.warn(f"{symbol}: bars between {last} and {latest.index.min()} are no longer "
+                              f"available intraday and are missing from the store")
+        tail = latest if last is None else latest[latest.index > last]
+        store.append(symbol, tail)
+
+    df = store.read(symbol, start, end)
+    df['moving_avg'] = df['close'].rolling(window=5).mean()
+    return df
     
-def transform_data(df):
+def transform_data(df, engine=None, symbol=None):
+    # with an indicators.IndicatorEngine, only bars newer than its state are scored, O(1) each
+    if engine is not None:
+        df = engine.updateFrame(symbol, df)
+        print(df.tail())  # For testing/logging purpose
+        return df
+
     df = df.sort_index()
     df['moving_avg'] = df['close'].rolling(window=5).mean()
     df['anomaly'] = abs(df['close'] - df['moving_avg']) > 2 * df['close'].std()
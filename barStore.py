@@ -0,0 +1,121 @@
+import os
+import re
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+STORE_DIR = os.environ.get("BAR_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "barstore"))
+
+_schema = pa.schema([('ts', pa.timestamp('ns'))] + [(c, pa.float64()) for c in BAR_COLUMNS])
+_datePartitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+_partSeq = re.compile(r"part-(\d{20})-")
+
+
+def _partName():
+    # write-time prefix: sorting part names gives write order, so the last write wins on read
+    return f"part-{time.time_ns():020d}-{uuid.uuid4().hex}.parquet"
+
+
+def _partOrder(path):
+    """Write order of a part file; parts from before sequence-prefixed names fall back to mtime."""
+    match = _partSeq.match(os.path.basename(path))
+    return int(match.group(1)) if match else os.stat(path).st_mtime_ns
+
+
+class BarStore:
+    """Local Parquet store of minute bars, laid out as <root>/symbol=XXX/date=YYYY-MM-DD/part-*.parquet.
+
+    `append` only adds files; `compact` folds a day's parts into one sorted,
+    de-duplicated file (last write wins). Not safe for two writers on one symbol.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def _symbolDir(self, symbol):
+        return os.path.join(self.root, f"symbol={symbol}")
+
+    def _dateDir(self, symbol, day):
+        return os.path.join(self._symbolDir(symbol), f"date={day}")
+
+    def append(self, symbol, df):
+        """Store bars from a fetch_data-shaped frame (timestamp index, OHLCV columns)."""
+        if df.empty:
+            return 0
+        frame = df[BAR_COLUMNS].astype(float).rename_axis('ts').reset_index()
+        frame['ts'] = pd.to_datetime(frame['ts'])
+        for day, part in frame.groupby(frame['ts'].dt.strftime('%Y-%m-%d'), sort=False):
+            folder = self._dateDir(symbol, day)
+            os.makedirs(folder, exist_ok=True)
+            table = pa.Table.from_pandas(part.sort_values('ts'), schema=_schema, preserve_index=False)
+            name = _partName()
+            tmp = os.path.join(folder, f".{name}.tmp")
+            pq.write_table(table, tmp)
+            os.replace(tmp, os.path.join(folder, name))
+        return len(frame)
+
+    def days(self, symbol):
+        folder = self._symbolDir(symbol)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name[5:] for name in os.listdir(folder) if name.startswith("date="))
+
+    def read(self, symbol, start=None, end=None, columns=None):
+        """Bars for `symbol` with start <= ts <= end, memory-mapped; `columns` projects OHLCV fields."""
+        if not self.days(symbol):
+            return pd.DataFrame(columns=columns or BAR_COLUMNS, index=pd.DatetimeIndex([]))
+
+        filters = []
+        if start is not None:
+            start = pd.Timestamp(start)
+            filters += [('date', '>=', start.strftime('%Y-%m-%d')), ('ts', '>=', start.to_datetime64())]
+        if end is not None:
+            end = pd.Timestamp(end)
+            filters += [('date', '<=', end.strftime('%Y-%m-%d')), ('ts', '<=', end.to_datetime64())]
+
+        dataset = ds.dataset(self._symbolDir(symbol), schema=_schema.append(pa.field('date', pa.string())),
+                             partitioning=_datePartitioning,
+                             filesystem=pa.fs.LocalFileSystem(use_mmap=True))
+        expression = pq.filters_to_expression(filters) if filters else None
+        # until a day is compacted, a re-written bar may appear in several parts: read them
+        # in write order so drop_duplicates(keep='last') keeps the latest write
+        fragments = sorted(dataset.get_fragments(filter=expression), key=lambda f: _partOrder(f.path))
+        columns = ['ts'] + list(columns or BAR_COLUMNS)
+        tables = [f.to_table(columns=columns, filter=expression, schema=dataset.schema) for f in fragments]
+        if not tables:
+            return pd.DataFrame(columns=columns[1:], index=pd.DatetimeIndex([]))
+        df = pa.concat_tables(tables).to_pandas().drop_duplicates('ts', keep='last').sort_values('ts')
+        return df.set_index('ts').rename_axis(None)
+
+    def lastTimestamp(self, symbol):
+        days = self.days(symbol)
+        if not days:
+            return None
+        last = pq.read_table(self._dateDir(symbol, days[-1]), columns=['ts'], memory_map=True)
+        return last.column('ts').to_pandas().max() if last.num_rows else None
+
+    def compact(self, symbol, day=None):
+        """Merge each day's part files into one (sorted, duplicates dropped). Returns days rewritten."""
+        rewritten = []
+        for d in ([day] if day else self.days(symbol)):
+            folder = self._dateDir(symbol, d)
+            parts = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".parquet")]
+            if len(parts) < 2:
+                continue
+            parts.sort(key=_partOrder)  # oldest first, so the last write wins
+            frame = pd.concat([pq.read_table(p).to_pandas() for p in parts], ignore_index=True)
+            frame = frame.drop_duplicates('ts', keep='last').sort_values('ts')
+            tmp = os.path.join(folder, ".compact.tmp")
+            pq.write_table(pa.Table.from_pandas(frame, schema=_schema, preserve_index=False), tmp)
+            target = os.path.join(folder, _partName())
+            os.replace(tmp, target)
+            for p in parts:
+                os.remove(p)
+            rewritten.append(d)
+        return rewritten
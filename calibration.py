@@ -0,0 +1,123 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from postgresql import execSelectColumns
+from monteCarloSimu import simulatePortfolio
+from tradingCalendar import getCalendar
+
+
+TRADING_DAYS = 252
+CACHE_DIR = os.environ.get("CALIBRATION_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".calibration"))
+
+_memory = {}
+_lock = threading.Lock()
+
+
+def _cachePath(source, symbol, start, end):
+    return os.path.join(CACHE_DIR, f"{source}_{symbol}_{start}_{end}.pkl")
+
+
+def _loadCloses(source, symbols, start, end):
+    """Daily closes for `symbols` from one columnar query: {symbol: Series indexed by date}."""
+    if source == "stockPrice":
+        df = execSelectColumns("""SELECT stock_id, date, "close" FROM stockPrice
+                                  WHERE stock_id = ANY(%s) AND date >= %s AND date < %s::date + 1
+                                  ORDER BY stock_id, date""",
+                               "PostgreSql", params=(list(symbols), start, end))
+        df.columns = ["symbol", "date", "close"]
+    elif source == "StockPriceDaily":
+        marks = ", ".join("?" * len(symbols))
+        # StockPriceDaily is written positionally (see stockPreprocess.py):
+        # stock_id, Date, open, high, low, close, adjClose, volume - use adjClose
+        cols = execSelectColumns("SELECT TOP 0 * FROM [stock].[dbo].[StockPriceDaily]", "SqlServer").columns
+        symbolCol, dateCol, adjCol = cols[0], cols[1], cols[6]
+        df = execSelectColumns(f"""SELECT [{symbolCol}], [{dateCol}], [{adjCol}] FROM [stock].[dbo].[StockPriceDaily]
+                                   WHERE [{symbolCol}] IN ({marks}) AND [{dateCol}] >= ? AND [{dateCol}] <= ?""",
+                               "SqlServer", params=(*symbols, start, end))
+        df.columns = ["symbol", "date", "close"]
+    else:
+        raise ValueError(f"unknown price source: {source}")
+
+    closes = {}
+    for symbol, group in df.groupby("symbol", sort=False):
+        # minute bars collapse to the day's last close
+        series = group.set_index("date")["close"].astype(float)
+        closes[symbol] = series.groupby(series.index.normalize()).last()
+    return closes
+
+
+def dailyCloses(symbols, start, end, source="stockPrice"):
+    """Daily closes per symbol, cached in memory and on disk per (source, symbol, window).
+
+    Only windows that end before the latest completed session go to disk; a window
+    still open can gain rows, so it is cached for this process only.
+    """
+    start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+    closed = end < getCalendar("XNYS").lastCompletedSession()
+    result, missing = {}, []
+    for s in symbols:
+        key = (source, s, start, end)
+        with _lock:
+            cached = _memory.get(key)
+        if cached is None and closed and os.path.exists(_cachePath(*key)):
+            cached = pd.read_pickle(_cachePath(*key))
+            with _lock:
+                _memory[key] = cached
+        if cached is None:
+            missing.append(s)
+        else:
+            result[s] = cached
+
+    if missing:
+        loaded = _loadCloses(source, missing, start, end)
+        if closed:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+        for s in missing:
+            series = loaded.get(s)
+            if series is None or len(series) < 3:
+                raise ValueError(f"not enough {source} history for {s} between {start} and {end}")
+            if closed:
+                series.to_pickle(_cachePath(source, s, start, end))
+            with _lock:
+                _memory[(source, s, start, end)] = series
+            result[s] = series
+    return result
+
+
+def calibrate(symbols, start, end, source="stockPrice"):
+    """Annualized GBM drift, volatility and return correlation for `symbols` over [start, end].
+
+    Returns (mu, sigma, corr, lastPrices) as arrays in `symbols` order. Correlation
+    uses dates where every symbol traded.
+    """
+    closes = dailyCloses(symbols, start, end, source)
+    prices = pd.concat({s: closes[s] for s in symbols}, axis=1).dropna()
+    logReturns = np.diff(np.log(prices.to_numpy()), axis=0)
+    if len(logReturns) < 2:
+        raise ValueError("fewer than two overlapping daily returns across the symbols")
+
+    sigma = logReturns.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+    mu = logReturns.mean(axis=0) * TRADING_DAYS + 0.5 * sigma**2
+    corr = np.corrcoef(logReturns, rowvar=False) if len(symbols) > 1 else np.ones((1, 1))
+    return mu, sigma, np.atleast_2d(corr), prices.to_numpy()[-1]
+
+
+def portfolioRisk(symbols, positions, start, end, source="stockPrice", horizonDays=10, **simOptions):
+    """Calibrate on stored prices, then simulate the correlated portfolio; returns VaR/CVaR and the estimates."""
+    mu, sigma, corr, last = calibrate(symbols, start, end, source)
+    risk = simulatePortfolio(mu, sigma, corr, positions, horizon=horizonDays / TRADING_DAYS, **simOptions)
+    risk["estimates"] = pd.DataFrame({"mu": mu, "sigma": sigma, "lastPrice": last}, index=symbols)
+    risk["correlation"] = pd.DataFrame(corr, index=symbols, columns=symbols)
+    return risk
+
+
+def clearCache(memoryOnly=False):
+    with _lock:
+        _memory.clear()
+    if not memoryOnly and os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".pkl"):
+                os.remove(os.path.join(CACHE_DIR, name))
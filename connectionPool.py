@@ -0,0 +1,198 @@
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+
+import psycopg2
+import pyodbc
+from config import get_connection, connSqlServerStr
+
+
+DEFAULT_MIN_SIZE = 1
+DEFAULT_MAX_SIZE = 10
+ACQUIRE_TIMEOUT = 30.0      # seconds to wait for a free connection
+HEALTH_CHECK_AFTER = 30.0   # only ping connections that sat idle longer than this
+MAX_IDLE_SECONDS = 600.0    # drop connections idle longer than this (keeps minSize)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived DB-API connections.
+
+    At most `maxSize` connections are checked out at once; `minSize` are opened
+    up front and kept warm. Idle connections are pinged with `healthQuery`
+    before reuse and replaced if the ping fails.
+    """
+
+    def __init__(self, connect, minSize=DEFAULT_MIN_SIZE, maxSize=DEFAULT_MAX_SIZE,
+                 healthQuery="SELECT 1", timeout=ACQUIRE_TIMEOUT,
+                 checkAfter=HEALTH_CHECK_AFTER, maxIdle=MAX_IDLE_SECONDS):
+        if minSize < 0 or maxSize < 1 or minSize > maxSize:
+            raise ValueError(f"invalid pool size min={minSize} max={maxSize}")
+
+        self._connect = connect
+        self.minSize = minSize
+        self.maxSize = maxSize
+        self.healthQuery = healthQuery
+        self.timeout = timeout
+        self.checkAfter = checkAfter
+        self.maxIdle = maxIdle
+
+        self._idle = LifoQueue()   # (conn, lastUsed); LIFO keeps hot connections hot
+        self._slots = threading.BoundedSemaphore(maxSize)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._closed = False
+
+        for _ in range(minSize):
+            self._idle.put((self._newConnection(), time.monotonic()))
+
+    # ---------- internals ----------
+    def _newConnection(self):
+        conn = self._connect()
+        with self._lock:
+            self._open += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._open -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _isHealthy(self, conn):
+        if getattr(conn, "closed", 0):  # psycopg2 exposes .closed, pyodbc does not
+            return False
+        try:
+            cur = conn.cursor()
+            cur.execute(self.healthQuery)
+            cur.fetchall()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # ---------- public API ----------
+    @property
+    def size(self):
+        return self._open
+
+    def acquire(self):
+        if self._closed:
+            raise PoolTimeout("pool is closed")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"no connection available within {self.timeout}s (maxSize={self.maxSize})")
+
+        try:
+            while True:
+                try:
+                    conn, lastUsed = self._idle.get_nowait()
+                except Empty:
+                    return self._newConnection()
+
+                idle = time.monotonic() - lastUsed
+                if idle > self.maxIdle and self._open > self.minSize:
+                    self._discard(conn)
+                    continue
+                if idle > self.checkAfter and not self._isHealthy(conn):
+                    self._discard(conn)
+                    continue
+                return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken=False):
+        try:
+            if broken or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.InterfaceError, psycopg2.OperationalError, pyodbc.OperationalError):
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken)
+
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor; commit once on success, roll back on any error."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+                conn.commit()
+            except BaseException:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                cur.close()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except Empty:
+                break
+            self._discard(conn)
+
+
+# ---------- shared pools, one per backend ----------
+_connectors = {
+    "PostgreSql": get_connection,
+    "SqlServer": lambda: pyodbc.connect(connSqlServerStr),
+}
+_pools = {}
+_poolOptions = {}
+_poolsLock = threading.Lock()
+
+
+def configurePool(type="SqlServer", **options):
+    """Set pool options (minSize, maxSize, timeout, ...) for a backend.
+
+    Takes effect the next time the pool is created; an existing pool is closed.
+    """
+    with _poolsLock:
+        _poolOptions[type] = options
+        old = _pools.pop(type, None)
+    if old is not None:
+        old.close()
+
+
+def getPool(type="SqlServer"):
+    pool = _pools.get(type)
+    if pool is not None:
+        return pool
+    with _poolsLock:
+        if type not in _pools:
+            if type not in _connectors:
+                raise ValueError(f"unknown database type: {type}")
+            _pools[type] = ConnectionPool(_connectors[type], **_poolOptions.get(type, {}))
+        return _pools[type]
+
+
+def closePools():
+    with _poolsLock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
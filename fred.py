@@ -1,9 +1,33 @@
-from fredapi import Fred
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.extras import execute_values
 from config import fredApi
+from httpCache import getJson, HOUR
+from postgresql import execSql, execSelect, transaction, invalidateQueryCache
+from sqlCommand import createMacro
+
+FRED_URL = "https://api.stlouisfed.org/fred/series/observations"
+MAX_WORKERS = 6
+
+
+def getSeries(seriesId, observation_start=None):
+    """Same result as fredapi's Fred.get_series, served through the on-disk HTTP cache.
+
+    FRED revises recent observations, so entries are refreshed after 12 hours.
+    """
+    data = getJson(
+        FRED_URL,
+        params={"series_id": seriesId, "api_key": fredApi, "file_type": "json",
+                "observation_start": observation_start},
+        ttl=12 * HOUR,
+        endpoint="fred_observations",
+    )
+    obs = data["observations"]
+    values = pd.to_numeric(pd.Series([o["value"] for o in obs], dtype=object), errors="coerce")  # "." marks missing
+    values.index = pd.to_datetime([o["date"] for o in obs])
+    values.name = seriesId
+    return values
 
-fred = Fred(api_key= fredApi)
-rate = fred.get_series('FEDFUNDS')
-print(rate.tail())
 
 l = [# Interest Rates
      'FEDFUNDS' # Federal Funds Rate   -- Daily, lag one day
@@ -28,9 +52,68 @@ l = [# Interest Rates
      ,"CSUSHPISA" #Home Price Index
      ]
 
-for i in l:
-    rate = fred.get_series(i)
-    print(rate.tail())
-    print(rate.shape[0]) # how many rows
+QUARTERLY = {"GDP", "GDPC1"}
+
+
+def lastStoredMonths(series=l):
+    """Last month with a value, per series, from one scan of MacroMonthly (None if never loaded)."""
+    cols = ", ".join(f'max(date) FILTER (WHERE "{s}" IS NOT NULL)' for s in series)
+    row = execSelect(f"SELECT {cols} FROM MacroMonthly", "PostgreSql")[0]
+    return dict(zip(series, row))
+
+
+def toMonthly(series):
+    """Put mixed-frequency series on the month-start grid.
+
+    Daily/weekly series are averaged over the month; quarterly ones are carried
+    across the two months that follow each observation.
+    """
+    frame = pd.concat({s.name: s for s in series}, axis=1).resample("MS").mean()
+    quarterly = [s.name for s in series if s.name in QUARTERLY]
+    frame[quarterly] = frame[quarterly].ffill(limit=2)
+    return frame
+
+
+def upsertMacroMonthly(frame):
+    """One batched INSERT ... ON CONFLICT (date); a NULL never overwrites a stored value."""
+    cols = list(frame.columns)
+    quoted = ", ".join(f'"{c}"' for c in cols)
+    updates = ", ".join(f'"{c}" = COALESCE(EXCLUDED."{c}", MacroMonthly."{c}")' for c in cols)
+    rows = [
+        (idx.date(), *(None if pd.isna(v) else float(v) for v in values))
+        for idx, values in zip(frame.index, frame.itertuples(index=False, name=None))
+    ]
+    with transaction("PostgreSql") as cur:
+        execute_values(cur, f"""INSERT INTO MacroMonthly (date, {quoted}) VALUES %s
+                                ON CONFLICT (date) DO UPDATE SET {updates}""", rows, page_size=1000)
+    invalidateQueryCache(["MacroMonthly"])
+    return len(rows)
+
+
+def loadMacroMonthly(series=l, maxWorkers=MAX_WORKERS):
+    """Fetch every series concurrently, each from its last stored month onwards, and upsert once."""
+    execSql(createMacro, type="PostgreSql")
+    last = lastStoredMonths(series)
+
+    # re-read each series' last stored month (its whole quarter for quarterly series):
+    # it may have been partial or since revised
+    def fetch(s):
+        start = last[s]
+        if start is not None and s in QUARTERLY:
+            start = (pd.Timestamp(start) - pd.DateOffset(months=2)).date()
+        return getSeries(s, observation_start=start.isoformat() if start else None)
+
+    with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+        fetched = list(pool.map(fetch, series))
+
+    for s in fetched:
+        print(f"{s.name}: {s.shape[0]} observations since {last[s.name] or 'the start'}")
+
+    fetched = [s.dropna() for s in fetched if not s.dropna().empty]
+    if not fetched:
+        return 0
+    return upsertMacroMonthly(toMonthly(fetched))
 
 
+if __name__ == '__main__':
+    print(f"upserted {loadMacroMonthly()} months into MacroMonthly")
@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+
+# Where responses live and how the cache behaves:
+#   use     - serve fresh entries from disk, fetch and store on miss (default)
+#   refresh - always fetch, overwrite what's stored
+#   replay  - strictly offline: serve any stored entry regardless of age, raise CacheMiss if none (tests, backfill re-runs)
+#   off     - bypass the cache entirely
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".httpcache"))
+CACHE_MODE = os.environ.get("HTTP_CACHE_MODE", "use")
+
+NEVER = None                 # ttl for immutable data, e.g. a closed trading day
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# query parameters that identify the caller, not the data; never part of the key
+SECRET_PARAMS = {"apikey", "api_key", "apiKey", "token"}
+
+TIMEOUT = 30
+
+
+class CacheMiss(Exception):
+    pass
+
+
+_session = None
+_sessionLock = threading.Lock()
+
+
+def session():
+    global _session
+    with _sessionLock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+
+def normalizeUrl(url, params=None):
+    """Lower-case scheme/host, merge and sort query params, drop credentials."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(k, str(v)) for k, v in params.items() if v is not None]
+    query = sorted((k, v) for k, v in query if k not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def _path(endpoint, key):
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, endpoint, digest[:2], digest + ".json.gz")
+
+
+def _read(path):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp, path)
+
+
+def getJson(url, params=None, ttl=HOUR, endpoint="default", headers=None, validate=None, mode=None,
+            limiter=None):
+    """GET `url` and return its JSON body, going through the on-disk cache.
+
+    `ttl` is seconds until an entry goes stale (NEVER for immutable history).
+    `endpoint` groups entries on disk. `validate(body)` may reject a payload
+    (e.g. a rate-limit notice) so it is returned but not stored. `limiter.wait()`
+    is called before a network request only, never for a cache hit.
+    """
+    mode = mode or CACHE_MODE
+    key = normalizeUrl(url, params)
+    path = _path(endpoint, key)
+
+    if mode == "replay":
+        # offline runs serve whatever was recorded, however old
+        entry = _read(path)
+        if entry is None:
+            raise CacheMiss(f"replay mode: no cached response for {key}")
+        return entry["body"]
+
+    if mode == "use":
+        entry = _read(path)
+        if entry is not None and (entry["ttl"] is None or time.time() - entry["fetched_at"] < entry["ttl"]):
+            return entry["body"]
+
+    if limiter is not None:
+        limiter.wait()
+    response = session().get(url, params=params, headers=headers, timeout=TIMEOUT)
+    response.raise_for_status()
+    body = response.json()
+
+    if mode != "off" and (validate is None or validate(body)):
+        _write(path, {"url": key, "fetched_at": time.time(), "ttl": ttl, "body": body})
+    return body
+
+
+def purge(endpoint=None, expiredOnly=True):
+    """Remove cache files (optionally for one endpoint); by default only stale ones."""
+    root = os.path.join(CACHE_DIR, endpoint) if endpoint else CACHE_DIR
+    removed = 0
+    now = time.time()
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            if expiredOnly:
+                entry = _read(path)
+                if entry is not None and (entry["ttl"] is None or now - entry["fetched_at"] < entry["ttl"]):
+                    continue
+            os.remove(path)
+            removed += 1
+    return removed
@@ -0,0 +1,141 @@
+import json
+import math
+import os
+from collections import deque
+
+import pandas as pd
+
+
+MEAN_WINDOW = 5      # same as transform_data's rolling(window=5).mean()
+STD_WINDOW = 60      # rolling volatility window replacing the whole-series std
+ANOMALY_SIGMAS = 2.0
+
+
+class RollingWindow:
+    """Fixed-size window with O(1) mean and sample variance (sliding Welford update)."""
+
+    def __init__(self, size, values=()):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.mean = 0.0
+        self.m2 = 0.0
+        for v in values:
+            self.push(v)
+
+    def push(self, x):
+        n = len(self.values)
+        if n < self.size:
+            delta = x - self.mean
+            self.mean += delta / (n + 1)
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.values[0]
+            oldMean = self.mean
+            self.mean += (x - old) / n
+            self.m2 += (x - old) * (x - self.mean + old - oldMean)
+            self.m2 = max(self.m2, 0.0)  # guard against rounding drift
+        self.values.append(x)
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def std(self):
+        n = len(self.values)
+        return math.sqrt(self.m2 / (n - 1)) if n > 1 else float("nan")
+
+
+class SymbolState:
+    """Per-symbol indicator state: rolling mean, rolling std and the last bar seen."""
+
+    def __init__(self, meanWindow=MEAN_WINDOW, stdWindow=STD_WINDOW, sigmas=ANOMALY_SIGMAS):
+        self.sigmas = sigmas
+        self.meanWin = RollingWindow(meanWindow)
+        self.stdWin = RollingWindow(stdWindow)
+        self.lastTs = None
+
+    def update(self, ts, close):
+        self.meanWin.push(close)
+        self.stdWin.push(close)
+        self.lastTs = ts
+
+        movingAvg = self.meanWin.mean if self.meanWin.full else float("nan")
+        std = self.stdWin.std() if self.stdWin.full else float("nan")
+        anomaly = bool(abs(close - movingAvg) > self.sigmas * std) if self.meanWin.full and self.stdWin.full else False
+        return movingAvg, std, anomaly
+
+    def toDict(self):
+        return {
+            "meanWindow": self.meanWin.size,
+            "stdWindow": self.stdWin.size,
+            "sigmas": self.sigmas,
+            # the window with the longer history is enough to rebuild both
+            "closes": list(self.stdWin.values if self.stdWin.size >= self.meanWin.size else self.meanWin.values),
+            "lastTs": None if self.lastTs is None else pd.Timestamp(self.lastTs).isoformat(),
+        }
+
+    @classmethod
+    def fromDict(cls, d):
+        state = cls(d["meanWindow"], d["stdWindow"], d["sigmas"])
+        closes = d["closes"]
+        state.meanWin = RollingWindow(state.meanWin.size, closes[-state.meanWin.size:])
+        state.stdWin = RollingWindow(state.stdWin.size, closes[-state.stdWin.size:])
+        state.lastTs = None if d["lastTs"] is None else pd.Timestamp(d["lastTs"])
+        return state
+
+
+class IndicatorEngine:
+    """Streaming version of alphavantage.transform_data: O(1) work per new bar, per symbol."""
+
+    def __init__(self, meanWindow=MEAN_WINDOW, stdWindow=STD_WINDOW, sigmas=ANOMALY_SIGMAS):
+        self.meanWindow = meanWindow
+        self.stdWindow = stdWindow
+        self.sigmas = sigmas
+        self.symbols = {}
+
+    def _state(self, symbol):
+        state = self.symbols.get(symbol)
+        if state is None:
+            state = self.symbols[symbol] = SymbolState(self.meanWindow, self.stdWindow, self.sigmas)
+        return state
+
+    def update(self, symbol, ts, close):
+        """Score one bar; returns (moving_avg, rolling_std, anomaly)."""
+        return self._state(symbol).update(ts, float(close))
+
+    def updateFrame(self, symbol, df):
+        """Score the bars of a fetch_data frame that are newer than the last one seen.
+
+        Returns those bars with moving_avg, rolling_std and anomaly columns.
+        """
+        state = self._state(symbol)
+        df = df.sort_index()
+        if state.lastTs is not None:
+            df = df[df.index > state.lastTs]
+
+        scored = [state.update(ts, close) for ts, close in zip(df.index, df['close'].astype(float))]
+        out = df.copy()
+        out['moving_avg'] = [s[0] for s in scored]
+        out['rolling_std'] = [s[1] for s in scored]
+        out['anomaly'] = [s[2] for s in scored]
+        return out
+
+    def checkpoint(self, path):
+        data = {
+            "meanWindow": self.meanWindow,
+            "stdWindow": self.stdWindow,
+            "sigmas": self.sigmas,
+            "symbols": {s: state.toDict() for s, state in self.symbols.items()},
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def restore(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        engine = cls(data["meanWindow"], data["stdWindow"], data["sigmas"])
+        engine.symbols = {s: SymbolState.fromDict(d) for s, d in data["symbols"].items()}
+        return engine
@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
+from threading import Thread
+import argparse
+import datetime
+import time
+import os
+
+import pandas as pd
+
+from alphavantage import fetch_data
+from pipeline import getWatermarks, newBars, recordIngestRun
+from postgresql import execSelect, upsertStockPrice
+from stockPartitions import ensureStockPricePartitions
+
+MAX_WORKERS = 8             # concurrent fetches; keep within the API plan's rate limit
+BATCH_ROWS = 50_000         # flush to the database once this many bars are buffered
+FLUSH_SECONDS = 5.0         # ... or after this long, whichever comes first
+QUEUE_SIZE = 64             # fetched frames waiting on the writer; fetchers block when full
+
+_DONE = object()
+
+
+def loadUniverse(path=None):
+    """Symbols from a file (one per line, # comments allowed), else from CompanyInfo."""
+    if path:
+        with open(path) as f:
+            symbols = [line.split("#")[0].strip() for line in f]
+        return sorted({s for s in symbols if s})
+    # ticker is the first column of CompanyInfo (see API/basicInfo.InsertSql)
+    rows = execSelect("SELECT * FROM [stock].[dbo].[CompanyInfo]", "SqlServer")
+    return sorted({row[0] for row in rows})
+
+
+def fetchSymbol(symbol, watermark, out):
+    startedAt = datetime.datetime.now()
+    try:
+        df = fetch_data(symbol)
+    except Exception as e:
+        print(f"[{symbol}] fetch failed: {e}")
+        out.put((symbol, startedAt, watermark, None, e))
+        return
+    out.put((symbol, startedAt, watermark, df, None))
+
+
+def writeBatch(batch, stats):
+    """Upsert every fresh frame in `batch` with one COPY; fall back to per-symbol on failure."""
+    frames = [fresh.assign(stock_id=symbol) for symbol, _, _, _, fresh in batch if not fresh.empty]
+    if frames:
+        combined = pd.concat(frames)
+        ensureStockPricePartitions(start=combined.index.min())
+        try:
+            upsertStockPrice(combined)
+            loaded = {symbol: len(fresh) for symbol, _, _, _, fresh in batch}
+        except Exception as e:
+            print(f"[writer] batch of {len(frames)} symbols failed ({e}); retrying per symbol")
+            loaded = {}
+            for symbol, _, _, _, fresh in batch:
+                try:
+                    loaded[symbol] = upsertStockPrice(fresh, symbol) if not fresh.empty else 0
+                except Exception as e:
+                    print(f"[{symbol}] load failed: {e}")
+                    stats["failed"].append(symbol)
+    else:
+        loaded = {symbol: 0 for symbol, *_ in batch}
+
+    for symbol, startedAt, watermark, fetched, fresh in batch:
+        if symbol not in loaded:
+            continue
+        after = fresh.index.max().to_pydatetime() if not fresh.empty else watermark
+        try:
+            recordIngestRun(symbol, startedAt, watermark, after, fetched, loaded[symbol])
+        except Exception as e:
+            print(f"[{symbol}] could not record run: {e}")
+        stats["rows"] += loaded[symbol]
+        stats["loaded"] += 1
+
+
+def writer(q, stats, batchRows, flushSeconds):
+    batch, rows, lastFlush = [], 0, time.monotonic()
+    while True:
+        try:
+            item = q.get(timeout=flushSeconds)
+        except Empty:
+            item = None
+
+        if item is _DONE:
+            break
+        if item is not None:
+            symbol, startedAt, watermark, df, error = item
+            if error is not None:
+                stats["failed"].append(symbol)
+            else:
+                try:
+                    fresh = newBars(df, watermark)
+                except Exception as e:
+                    print(f"[{symbol}] bad frame: {e}")
+                    stats["failed"].append(symbol)
+                else:
+                    batch.append((symbol, startedAt, watermark, len(df), fresh))
+                    rows += len(fresh)
+
+        if batch and (rows >= batchRows or time.monotonic() - lastFlush >= flushSeconds):
+            flush(batch, stats)
+            batch, rows, lastFlush = [], 0, time.monotonic()
+
+    if batch:
+        flush(batch, stats)
+
+
+def flush(batch, stats):
+    # the writer thread must survive anything, or fetchers would block on a full queue forever
+    try:
+        writeBatch(batch, stats)
+    except Exception as e:
+        print(f"[writer] flush failed: {e}")
+        stats["failed"].extend(symbol for symbol, *_ in batch)
+
+
+def run(symbols, maxWorkers=MAX_WORKERS, batchRows=BATCH_ROWS, flushSeconds=FLUSH_SECONDS):
+    """Fetch `symbols` concurrently and load them incrementally; one symbol failing never stops the rest."""
+    start = time.perf_counter()
+    watermarks = getWatermarks(symbols)
+
+    q = Queue(maxsize=QUEUE_SIZE)
+    stats = {"rows": 0, "loaded": 0, "failed": []}
+    writerThread = Thread(target=writer, args=(q, stats, batchRows, flushSeconds), daemon=True)
+    writerThread.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+            for symbol in symbols:
+                pool.submit(fetchSymbol, symbol, watermarks[symbol], q)
+    finally:
+        q.put(_DONE)
+        writerThread.join()
+
+    elapsed = time.perf_counter() - start
+    print(f"{stats['loaded']}/{len(symbols)} symbols, {stats['rows']} rows in {elapsed:.1f}s; "
+          f"failed: {stats['failed'] or 'none'}")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Concurrent multi-symbol intraday ingestion")
+    parser.add_argument("--symbols", help="file with one symbol per line (default: CompanyInfo table)")
+    parser.add_argument("--workers", type=int, default=min(MAX_WORKERS, (os.cpu_count() or 4) * 2))
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    run(loadUniverse(args.symbols), maxWorkers=args.workers, batchRows=args.batch_rows)
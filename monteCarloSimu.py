@@ -1,5 +1,10 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+
 import numpy as np
 import matplotlib.pyplot as plt
+from scipy.stats import norm, qmc
 
 # Parameters
 S0 = 100        # Initial stock price
@@ -10,20 +15,366 @@ dt = 1/252      # Daily steps
 N = int(T/dt)   # Number of time steps
 M = 100         # Number of simulations
 
-# Simulation
-np.random.seed(42)
-paths = np.zeros((N + 1, M))
-paths[0] = S0
-
-for t in range(1, N + 1):
-    Z = np.random.standard_normal(M)
-    paths[t] = paths[t - 1] * np.exp((mu - 0.5 * sigma**2) * dt + sigma * np.sqrt(dt) * Z)
-
-# Plot
-plt.figure(figsize=(10, 5))
-plt.plot(paths)
-plt.title("Monte Carlo Simulation of Stock Price Paths ")
-plt.xlabel("Time Steps (Days)")
-plt.ylabel("Stock Price:")
-plt.grid(True)
-plt.show()
\ No newline at end of file
+CHUNK_PATHS = 100_000                   # paths per block; bounds path memory to CHUNK_PATHS * (N + 1) values
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def _logIncrements(rng, mu, sigma, dt, steps, paths, dtype):
+    Z = rng.standard_normal((steps, paths), dtype=dtype)
+    return dtype((mu - 0.5 * sigma**2) * dt) + dtype(sigma * np.sqrt(dt)) * Z
+
+
+def _paths(rng, S0, mu, sigma, T, steps, paths, dtype):
+    dt = T / steps
+    logPaths = np.empty((steps + 1, paths), dtype=dtype)
+    logPaths[0] = 0
+    np.cumsum(_logIncrements(rng, mu, sigma, dt, steps, paths, dtype), axis=0, out=logPaths[1:])
+    np.exp(logPaths, out=logPaths)
+    logPaths *= dtype(S0)
+    return logPaths
+
+
+def _chunkSizes(paths, chunkPaths):
+    return [min(chunkPaths, paths - i) for i in range(0, paths, chunkPaths)]
+
+
+def _streams(seed, count):
+    # independent, reproducible streams: the same seed gives the same paths whatever the worker count
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(count)]
+
+
+def simulateGBM(S0=S0, mu=mu, sigma=sigma, T=T, steps=N, paths=M, seed=42, dtype=np.float64):
+    """Full GBM price paths, shape (steps + 1, paths), from one batched draw and a cumulative sum."""
+    return _paths(np.random.default_rng(seed), S0, mu, sigma, T, steps, paths, np.dtype(dtype).type)
+
+
+def _pathChunk(args):
+    rng, S0, mu, sigma, T, steps, size, dtype = args
+    return _paths(rng, S0, mu, sigma, T, steps, size, dtype)
+
+
+def simulateGBMChunks(S0=S0, mu=mu, sigma=sigma, T=T, steps=N, paths=M, seed=42,
+                      dtype=np.float64, chunkPaths=CHUNK_PATHS, workers=1):
+    """Yield the paths of a large simulation in (steps + 1, <=chunkPaths) blocks.
+
+    With workers > 1 the blocks are generated in a process pool, at most `workers`
+    ahead of the consumer, so memory stays bounded by ~2 * workers blocks.
+    """
+    dtype = np.dtype(dtype).type
+    sizes = _chunkSizes(paths, chunkPaths)
+    tasks = [(rng, S0, mu, sigma, T, steps, size, dtype) for rng, size in zip(_streams(seed, len(sizes)), sizes)]
+    if workers == 1 or len(tasks) == 1:
+        for task in tasks:
+            yield _pathChunk(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(_pathChunk, t) for t in tasks[:workers])
+        for task in tasks[workers:] + [None] * workers:
+            block = pending.popleft().result()
+            if task is not None:
+                pending.append(pool.submit(_pathChunk, task))
+            yield block
+            if not pending:
+                break
+
+
+QUANTILE_BINS = 1 << 16         # histogram bins over Z in [-Z_RANGE, Z_RANGE] for terminal quantiles
+Z_RANGE = 12.0
+
+
+def _chunkMoments(x):
+    """(n, mean, M2, M3, M4) with M_k the sum of k-th powers of deviations from the mean."""
+    x = x.astype(np.float64)
+    mean = x.mean()
+    d = x - mean
+    d2 = d * d
+    return len(x), mean, d2.sum(), (d2 * d).sum(), (d2 * d2).sum()
+
+
+def _mergeMoments(a, b):
+    # pairwise update of central moment sums (Chan et al. / Pebay)
+    na, ma, M2a, M3a, M4a = a
+    nb, mb, M2b, M3b, M4b = b
+    n = na + nb
+    delta = mb - ma
+    mean = ma + delta * nb / n
+    M2 = M2a + M2b + delta**2 * na * nb / n
+    M3 = (M3a + M3b + delta**3 * na * nb * (na - nb) / n**2
+          + 3 * delta * (na * M2b - nb * M2a) / n)
+    M4 = (M4a + M4b + delta**4 * na * nb * (na * na - na * nb + nb * nb) / n**3
+          + 6 * delta**2 * (na * na * M2b + nb * nb * M2a) / n**2
+          + 4 * delta * (na * M3b - nb * M3a) / n)
+    return n, mean, M2, M3, M4
+
+
+def _terminalChunk(args):
+    rng, S0, mu, sigma, T, size, dtype = args
+    # GBM's terminal log-price is exactly normal: one draw per path, whatever the step count
+    Z = rng.standard_normal(size, dtype=dtype)
+    terminal = S0 * np.exp(dtype((mu - 0.5 * sigma**2) * T) + dtype(sigma * np.sqrt(T)) * Z)
+    # the price is monotone in Z, so a fixed-range histogram of Z merges across chunks into quantiles
+    counts = np.bincount(np.clip(((Z + Z_RANGE) * (QUANTILE_BINS / (2 * Z_RANGE))).astype(np.int64),
+                                 0, QUANTILE_BINS - 1), minlength=QUANTILE_BINS)
+    return _chunkMoments(terminal), counts
+
+
+def _histQuantiles(counts, quantiles):
+    cum = np.cumsum(counts)
+    width = 2 * Z_RANGE / QUANTILE_BINS
+    target = np.asarray(quantiles) * cum[-1]
+    idx = np.minimum(np.searchsorted(cum, target), QUANTILE_BINS - 1)
+    before = cum[idx] - counts[idx]
+    frac = (target - before) / np.maximum(counts[idx], 1)
+    return -Z_RANGE + (idx + frac) * width
+
+
+def terminalStats(S0=S0, mu=mu, sigma=sigma, T=T, paths=1_000_000, seed=42,
+                  dtype=np.float32, chunkPaths=CHUNK_PATHS, workers=None, quantiles=QUANTILES):
+    """Moments and quantiles of the terminal price without materializing paths.
+
+    Chunks run in a process pool (workers=1 runs inline); each has its own spawned
+    random stream, so results depend only on `seed` and `chunkPaths`. Each chunk is
+    reduced to mergeable moment sums and a histogram, so memory does not grow with
+    `paths`; quantiles are exact to within one histogram bin (2 * Z_RANGE / QUANTILE_BINS
+    standard deviations of the log-price).
+    """
+    dtype = np.dtype(dtype).type
+    sizes = _chunkSizes(paths, chunkPaths)
+    tasks = [(rng, S0, mu, sigma, T, size, dtype) for rng, size in zip(_streams(seed, len(sizes)), sizes)]
+
+    def reduce(results):
+        moments, counts = None, np.zeros(QUANTILE_BINS, dtype=np.int64)
+        for m, c in results:
+            moments = m if moments is None else _mergeMoments(moments, m)
+            counts += c
+        return moments, counts
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        (n, mean, M2, M3, M4), counts = reduce(_terminalChunk(t) for t in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            (n, mean, M2, M3, M4), counts = reduce(pool.map(_terminalChunk, tasks))
+
+    var = M2 / n
+    z = _histQuantiles(counts, quantiles)
+    priceAt = S0 * np.exp((mu - 0.5 * sigma**2) * T + sigma * np.sqrt(T) * z)
+    return {
+        "paths": paths,
+        "mean": float(mean),
+        "std": float(np.sqrt(M2 / (n - 1))) if n > 1 else 0.0,
+        "skew": float(M3 / n / var**1.5),
+        "kurtosis": float(M4 / n / var**2 - 3),
+        "quantiles": {q: float(v) for q, v in zip(quantiles, priceAt)},
+        "analyticMean": float(S0 * np.exp(mu * T)),
+    }
+
+
+def _cholesky(corr):
+    """Cholesky factor of a correlation matrix, clipping negative eigenvalues if it isn't PD."""
+    try:
+        return np.linalg.cholesky(corr)
+    except np.linalg.LinAlgError:
+        w, v = np.linalg.eigh(corr)
+        fixed = (v * np.clip(w, 1e-10, None)) @ v.T
+        d = np.sqrt(np.diag(fixed))
+        return np.linalg.cholesky(fixed / np.outer(d, d))
+
+
+def _portfolioChunk(args):
+    rng, L, drift, vol, positions, size, dtype = args
+    Z = rng.standard_normal((size, len(positions)), dtype=dtype) @ L.T.astype(dtype)
+    return np.expm1(drift + vol * Z) @ positions.astype(dtype)
+
+
+def simulatePortfolio(mus, sigmas, corr, positions, horizon=10/252, paths=1_000_000, seed=42,
+                      dtype=np.float32, chunkPaths=CHUNK_PATHS, workers=1, alphas=(0.95, 0.99)):
+    """Correlated GBM portfolio P&L over `horizon` years, with VaR and CVaR.
+
+    `positions` are currency amounts per asset. Each chunk is one batched
+    (paths, assets) normal draw multiplied by the Cholesky factor of `corr`.
+    VaR/CVaR are reported as positive losses.
+    """
+    dtype = np.dtype(dtype).type
+    mus, sigmas, positions = (np.asarray(a, dtype=np.float64) for a in (mus, sigmas, positions))
+    L = _cholesky(np.asarray(corr, dtype=np.float64))
+    drift = ((mus - 0.5 * sigmas**2) * horizon).astype(dtype)
+    vol = (sigmas * np.sqrt(horizon)).astype(dtype)
+
+    sizes = _chunkSizes(paths, chunkPaths)
+    tasks = [(rng, L, drift, vol, positions, size, dtype) for rng, size in zip(_streams(seed, len(sizes)), sizes)]
+    if workers == 1 or len(tasks) == 1:
+        pnl = np.concatenate([_portfolioChunk(t) for t in tasks])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pnl = np.concatenate(list(pool.map(_portfolioChunk, tasks)))
+
+    pnl = pnl.astype(np.float64)
+    risk = {"paths": paths, "horizon": horizon, "meanPnL": float(pnl.mean()), "stdPnL": float(pnl.std(ddof=1))}
+    for a in alphas:
+        cutoff = np.quantile(pnl, 1 - a)
+        risk[f"VaR{a:g}"] = float(-cutoff)
+        risk[f"CVaR{a:g}"] = float(-pnl[pnl <= cutoff].mean())
+    return risk
+
+
+# ---------- variance reduction ----------
+BATCH_PATHS = 1 << 14           # paths per batch in estimate(); a power of two keeps Sobol balanced
+MAX_PATHS = 1 << 24
+SOBOL_MIN_BATCHES = 16          # independent scrambles before a Sobol standard error is trusted
+METHODS = ("plain", "antithetic", "control", "sobol")
+
+
+def terminalPrice(paths):
+    return paths[-1]
+
+
+def _pathsFromW(W, S0, mu, sigma, T):
+    """Price paths (steps + 1, n) from Brownian motion W sampled at t_1..t_steps."""
+    steps = W.shape[0]
+    t = np.linspace(T / steps, T, steps)[:, None]
+    paths = np.empty((steps + 1, W.shape[1]))
+    paths[0] = S0
+    paths[1:] = S0 * np.exp((mu - 0.5 * sigma**2) * t + sigma * W)
+    return paths
+
+
+def _bridgePlan(steps, T):
+    """Brownian-bridge construction order: (index, left, right, wLeft, wRight, sd) per normal.
+
+    The first normal fixes W(T), the next ones the midpoints of ever smaller intervals,
+    so the low (best distributed) Sobol dimensions drive the coarse path shape.
+    """
+    t = np.linspace(0, T, steps + 1)
+    plan = [(steps, 0, None, 0.0, 0.0, np.sqrt(T))]
+    queue = [(0, steps)]
+    while queue:
+        l, r = queue.pop(0)
+        if r - l < 2:
+            continue
+        m = (l + r) // 2
+        span = t[r] - t[l]
+        plan.append((m, l, r, (t[r] - t[m]) / span, (t[m] - t[l]) / span,
+                     np.sqrt((t[m] - t[l]) * (t[r] - t[m]) / span)))
+        queue += [(l, m), (m, r)]
+    return plan
+
+
+def _bridgeW(Z, plan):
+    # Z is (n, steps) standard normals; returns W at t_1..t_steps as (steps, n)
+    W = np.zeros((len(plan) + 1, Z.shape[0]))
+    for k, (m, l, r, wl, wr, sd) in enumerate(plan):
+        W[m] = sd * Z[:, k] if r is None else wl * W[l] + wr * W[r] + sd * Z[:, k]
+    return W[1:]
+
+
+class _Moments:
+    """Running sums for the mean and variance of Y, and of Y adjusted by a control X."""
+
+    def __init__(self):
+        self.n = 0
+        self.sy = self.syy = self.sx = self.sxx = self.sxy = 0.0
+
+    def add(self, y, x=None):
+        self.n += len(y)
+        self.sy += y.sum()
+        self.syy += (y * y).sum()
+        if x is not None:
+            self.sx += x.sum()
+            self.sxx += (x * x).sum()
+            self.sxy += (x * y).sum()
+
+    def plain(self):
+        mean = self.sy / self.n
+        var = max(self.syy / self.n - mean**2, 0.0) * self.n / max(self.n - 1, 1)
+        return mean, np.sqrt(var / self.n)
+
+    def controlled(self, expectedX):
+        n = self.n
+        my, mx = self.sy / n, self.sx / n
+        varX = self.sxx / n - mx**2
+        cov = self.sxy / n - mx * my
+        varY = self.syy / n - my**2
+        beta = cov / varX if varX > 0 else 0.0
+        var = max(varY - beta * cov, 0.0) * n / max(n - 3, 1)
+        return my - beta * (mx - expectedX), np.sqrt(var / n)
+
+
+def estimate(payoff=terminalPrice, S0=S0, mu=mu, sigma=sigma, T=T, steps=N, method="plain",
+             paths=BATCH_PATHS, targetSE=None, maxPaths=MAX_PATHS, batchPaths=BATCH_PATHS, seed=42):
+    """Monte Carlo estimate of E[payoff(paths)] under GBM, with optional variance reduction.
+
+    `payoff` maps a (steps + 1, n) path block to n values. Methods:
+      plain      - pseudo-random paths
+      antithetic - each Z paired with -Z; pairs are averaged before computing the error
+      control    - terminal price as control variate, using the analytic E[S_T] = S0 e^(mu T)
+      sobol      - scrambled Sobol points with Brownian-bridge construction; the error comes
+                   from independent scrambles (one per batch), so at least SOBOL_MIN_BATCHES
+                   batches of min(batchPaths, budget) / SOBOL_MIN_BATCHES paths run
+    With `targetSE`, batches are added until the standard error reaches it (or maxPaths);
+    otherwise `paths` paths are used (for sobol, rounded down to whole power-of-two batches).
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    rng = np.random.default_rng(seed)
+    dt = T / steps
+    expectedST = S0 * np.exp(mu * T)
+    budget = maxPaths if targetSE else paths
+    minBatches = SOBOL_MIN_BATCHES if method == "sobol" else 1
+    plan = _bridgePlan(steps, T) if method == "sobol" else None
+    if method == "sobol":
+        if budget < minBatches:
+            raise ValueError(f"sobol needs at least {minBatches} paths")
+        # Sobol points balance in power-of-two blocks; size them so that the minimum number of
+        # scrambles fits in batchPaths, and targetSE is first checked after that many paths
+        batchPaths = 1 << ((min(batchPaths, budget) // minBatches).bit_length() - 1)
+        budget -= budget % batchPaths
+
+    moments, batchMeans, used = _Moments(), [], 0
+    while used < budget:
+        n = min(batchPaths, budget - used)
+        if method == "sobol":
+            u = qmc.Sobol(d=steps, scramble=True, seed=rng).random(n)
+            W = _bridgeW(norm.ppf(np.clip(u, 1e-12, 1 - 1e-12)), plan)
+            batchMeans.append(payoff(_pathsFromW(W, S0, mu, sigma, T)).mean())
+        elif method == "antithetic":
+            half = max(n // 2, 1)
+            W = np.cumsum(np.sqrt(dt) * rng.standard_normal((steps, half)), axis=0)
+            y = 0.5 * (payoff(_pathsFromW(W, S0, mu, sigma, T)) + payoff(_pathsFromW(-W, S0, mu, sigma, T)))
+            moments.add(y)
+            n = 2 * half
+        else:
+            W = np.cumsum(np.sqrt(dt) * rng.standard_normal((steps, n)), axis=0)
+            block = _pathsFromW(W, S0, mu, sigma, T)
+            moments.add(payoff(block), block[-1] if method == "control" else None)
+        used += n
+
+        if method == "sobol":
+            k = len(batchMeans)
+            value = float(np.mean(batchMeans))
+            stdError = float(np.std(batchMeans, ddof=1) / np.sqrt(k)) if k > 1 else float("inf")
+        elif method == "control":
+            value, stdError = moments.controlled(expectedST)
+        else:
+            value, stdError = moments.plain()
+
+        if targetSE and stdError <= targetSE and max(len(batchMeans), 1) >= minBatches:
+            break
+
+    return {"method": method, "estimate": float(value), "stdError": float(stdError),
+            "ci95": (float(value - 1.96 * stdError), float(value + 1.96 * stdError)), "paths": used}
+
+
+if __name__ == '__main__':
+    # Simulation
+    paths = simulateGBM(S0, mu, sigma, T, N, M, seed=42)
+
+    # Plot
+    plt.figure(figsize=(10, 5))
+    plt.plot(paths)
+    plt.title("Monte Carlo Simulation of Stock Price Paths ")
+    plt.xlabel("Time Steps (Days)")
+    plt.ylabel("Stock Price:")
+    plt.grid(True)
+    plt.show()
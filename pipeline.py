@@ -1,39 +1,59 @@
-from postgresql import execSql, execSelect
-from sqlCommand import CreateCashflow, createStockPrice
+from postgresql import execSql, transaction, upsertStockPrice
+from sqlCommand import CreateCashflow, createStockPrice, createIngestRun
 from alphavantage import fetch_data
+from stockPartitions import ensureStockPricePartitions
 import pandas as pd
-from io import StringIO
+import datetime
 
 
+def getWatermarks(symbols):
+    """High-water mark (max stored date) per symbol, in one query. Missing symbols map to None."""
+    with transaction("PostgreSql") as cur:
+        cur.execute("""SELECT stock_id, max(date) FROM stockPrice
+                       WHERE stock_id = ANY(%s) GROUP BY stock_id""", (list(symbols),))
+        found = dict(cur.fetchall())
+    return {s: found.get(s) for s in symbols}
 
-execSql(CreateCashflow)
-execSql(createStockPrice)
 
+def newBars(df, watermark):
+    """Only bars strictly newer than the stored watermark."""
+    if watermark is None:
+        return df
+    return df[df.index > pd.Timestamp(watermark)]
 
 
-symbol = "TSLA"
+def recordIngestRun(symbol, startedAt, before, after, fetched, loaded):
+    execSql("""INSERT INTO ingestRun (stock_id, started_at, finished_at, watermark_before,
+                                      watermark_after, rows_fetched, rows_loaded)
+               VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+            (symbol, startedAt, datetime.datetime.now(), before, after, fetched, loaded), "PostgreSql")
 
-df = fetch_data(symbol)
 
+def ingestSymbol(symbol, watermark=None, incremental=True):
+    startedAt = datetime.datetime.now()
+    df = fetch_data(symbol)
 
+    fresh = newBars(df, watermark) if incremental else df
+    loaded = 0
+    if not fresh.empty:
+        # no-op unless stockPrice is partitioned (see stockPartitions.migrateToPartitioned)
+        ensureStockPricePartitions(start=fresh.index.min())
 
-rows = execSelect("select * from stockPrice")
-print(rows)
+        # one COPY + one set-based ON CONFLICT merge instead of an INSERT per bar
+        loaded = upsertStockPrice(fresh, symbol)
 
-for idx, row in df.tail().iterrows():
-    
-    query = f"""INSERT INTO stockPrice values ('{symbol}','{idx.to_pydatetime()}','{row['open']}','{row['high']}','{row['low']}','{row['close']}','{row['volume']}')
-                ON CONFLICT (stock_id, date) 
-                DO UPDATE SET
-                    open = EXCLUDED.open,
-                    high = EXCLUDED.high,
-                    low = EXCLUDED.low,
-                    close = EXCLUDED.close,
-                    volume = EXCLUDED.volume;
-    
-    """
-    print(query)
+    after = fresh.index.max().to_pydatetime() if not fresh.empty else watermark
+    recordIngestRun(symbol, startedAt, watermark, after, len(df), loaded)
+    print(f"{symbol}: fetched {len(df)}, new {len(fresh)}, upserted {loaded} (watermark {watermark} -> {after})")
+    return loaded
 
-    execSql(query)
 
-    # print(f"Date: {idx.date()}, Time: {idx.time()}, Open: {row['open']}")
\ No newline at end of file
+if __name__ == '__main__':
+    execSql(CreateCashflow, type="PostgreSql")
+    execSql(createStockPrice, type="PostgreSql")
+    execSql(createIngestRun, type="PostgreSql")
+
+    symbol = "TSLA"
+
+    watermarks = getWatermarks([symbol])
+    ingestSymbol(symbol, watermarks[symbol])
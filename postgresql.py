@@ -1,96 +1,319 @@
 import psycopg2
 from sqlCommand import CreateCashflow
 import pyodbc
-from config import get_connection, connSqlServer, connSqlServerStr
+from connectionPool import getPool, configurePool, closePools
+from queryCache import QueryCache, tablesWritten
+from queryStats import QueryStats
 
+import csv
 import datetime
+import itertools
 from decimal import Decimal
+from io import StringIO
+
+import numpy as np
+import pandas as pd
 
 #conn = get_connection() # for postgre sql
 
 # from pipeline import fetch_data
 
-def execSql(query="", values = (), type = "SqlServer"):
+# Connections come from a shared, thread-safe pool per backend (see connectionPool.py).
+# Size it once at startup, e.g. configurePool("PostgreSql", minSize=2, maxSize=16)
 
-    if type == "PostgreSql":
-        # Database connection parameters
-        connection = get_connection()
-        cur = connection.cursor()
 
+def transaction(type = "SqlServer"):
+    """Group many statements into one commit:
 
-        # Create table
-        cur.execute(query)
+        with transaction("PostgreSql") as cur:
+            cur.execute(...)
+            cur.execute(...)
+    """
+    return getPool(type).transaction()
 
 
-        # Cleanup
-        connection.commit()
-        cur.close()
-        connection.close()
-    else:
+# Optional read-through cache for execSelect; off until enableQueryCache() is called.
+_queryCache = None
+
+
+def enableQueryCache(maxEntries=256, ttl=300.0):
+    global _queryCache
+    _queryCache = QueryCache(maxEntries, ttl)
+    return _queryCache
+
+
+def disableQueryCache():
+    global _queryCache
+    _queryCache = None
+
+
+def invalidateQueryCache(tables):
+    """Evict cached reads of `tables`; needed after writes made through transaction() directly."""
+    if _queryCache is not None:
+        _queryCache.invalidate(tables)
+
+
+def queryCacheStats():
+    return _queryCache.stats() if _queryCache is not None else None
+
 
-        conn = pyodbc.connect(connSqlServerStr)
-        cursor = conn.cursor()
+# Per-statement connect/execute/fetch timings, grouped by normalized statement.
+# Statements slower than queryStats.slowThreshold seconds also go to queryStats.slow
+# (and to queryStats.slowLogPath as JSON lines when set); dump with dumpQueryStats().
+queryStats = QueryStats()
 
+
+def dumpQueryStats(path=None):
+    return queryStats.dumpJson(path)
+
+
+def execSql(query="", values = (), type = "SqlServer"):
+
+    if type == "PostgreSql":
+        with queryStats.timed(query, type) as t:
+            with transaction(type) as cur:
+                t.mark("connect")
+                cur.execute(query, values or None)
+                t.timing.rows = cur.rowcount
+            t.mark("execute")
+    else:
         try:
-            cursor.execute(query, values)
-            conn.commit()
-            print("Row inserted successfully.")
+            with queryStats.timed(query, type) as t:
+                with transaction(type) as cursor:
+                    t.mark("connect")
+                    cursor.execute(query, values)
+                    t.timing.rows = cursor.rowcount
+                t.mark("execute")
         except pyodbc.Error as e:
             print("Error:", e)
+
+    invalidateQueryCache(tablesWritten(query))
+
+
+def execSelect(query="select * from [stock].[dbo].[StockPriceDaily]", type = "SqlServer", params = None):
+    cache = _queryCache
+    if cache is not None:
+        key = cache.key(query, params, type)
+        rows = cache.get(key)
+        if rows is not None:
+            return list(rows)
+        generation = cache.generation(query)
+
+    with queryStats.timed(query, type) as t:
+        if type == "PostgreSql":
+            with transaction(type) as cur:
+                t.mark("connect")
+                cur.execute(query, params or None)
+                t.mark("execute")
+                rows = cur.fetchall()
+        else:
+
+            with transaction(type) as cursor:
+                t.mark("connect")
+                # Execute SQL query
+                cursor.execute(query, params or ())
+                t.mark("execute")
+
+                # Fetch all results
+                rows = cursor.fetchall()
+
+            rows = [convertRow(row) for row in rows]
+        t.mark("fetch")
+        t.timing.rows = len(rows)
+
+    if cache is not None:
+        cache.put(key, query, rows, generation)
+    return list(rows)
+
+
+def convertRow(row):
+    converted = []
+    for item in row:
+        if isinstance(item, datetime.datetime):
+            converted.append(item.strftime("%Y-%m-%d"))  # or item.isoformat()
+        elif isinstance(item, Decimal):
+            converted.append(float(item))  # or str(item) if you prefer string
+        else:
+            converted.append(item)  # int, str, etc.
+    return converted
+
+
+_cursorIds = itertools.count()
+
+
+def execSelectChunks(query="select * from [stock].[dbo].[StockPriceDaily]", type = "SqlServer", chunkSize = 10_000):
+    """Generator variant of execSelect that yields lists of at most `chunkSize` rows.
+
+    PostgreSql uses a server-side named cursor, SqlServer uses fetchmany, so only
+    one chunk is held in memory at a time. Rows are shaped like execSelect's.
+    The pooled connection is held until the generator is exhausted or closed.
+    """
+    with queryStats.timed(query, type) as t, getPool(type).connection() as conn:
+        t.mark("connect")
+        if type == "PostgreSql":
+            cur = conn.cursor(name=f"execSelectChunks_{next(_cursorIds)}")
+            cur.itersize = chunkSize
+        else:
+            cur = conn.cursor()
+
+        try:
+            cur.execute(query)
+            t.mark("execute")
+            while True:
+                rows = cur.fetchmany(chunkSize)
+                if not rows:
+                    break
+                t.mark("fetch")
+                t.timing.rows += len(rows)
+                yield rows if type == "PostgreSql" else [convertRow(row) for row in rows]
+                t.resume()  # time spent by the consumer isn't fetch time
         finally:
-            cursor.close()
-            conn.close()
+            cur.close()
+            conn.rollback()  # read-only; ends the cursor's transaction
+
 
+# column kinds for the columnar result format, keyed by psycopg2 type OID / pyodbc python type
+_pgKinds = {
+    16: "bool",
+    20: "int", 21: "int", 23: "int",
+    700: "float", 701: "float", 1700: "float",
+    1082: "datetime", 1114: "datetime", 1184: "datetimetz",
+}
+_odbcKinds = {
+    bool: "bool",
+    int: "int",
+    float: "float", Decimal: "float",
+    datetime.datetime: "datetime", datetime.date: "datetime",
+}
 
-def execSelect(query="select * from [stock].[dbo].[StockPriceDaily]", type = "SqlServer"):
+
+def _columnKind(typeCode, type):
     if type == "PostgreSql":
-        # Database connection parameters
-        connection = get_connection()
-        cur = connection.cursor()
+        return _pgKinds.get(typeCode, "object")
+    return _odbcKinds.get(typeCode, "object")
 
 
-        cur.execute(query)
-        rows = cur.fetchall()
+def _toArray(values, kind):
+    if kind == "float":
+        return np.array(values, dtype=np.float64)  # Decimal -> float, None -> nan
+    if kind == "int":
+        try:
+            return np.array(values, dtype=np.int64)
+        except TypeError:  # NULLs present
+            return np.array(values, dtype=np.float64)
+    if kind == "datetime":
+        return pd.to_datetime(pd.Series(values, dtype=object)).to_numpy()
+    if kind == "datetimetz":
+        # timestamptz rows carry fixed offsets that change across DST; normalize to UTC
+        return pd.to_datetime(pd.Series(values, dtype=object), utc=True).array
+    if kind == "bool" and None not in values:
+        return np.array(values, dtype=bool)
+    return np.array(values, dtype=object)
 
-        # Cleanup
-        connection.commit()
-        cur.close()
-        connection.close()
 
-        return rows
-    else:
+def execSelectColumns(query="select * from [stock].[dbo].[StockPriceDaily]", type = "SqlServer", asFrame = True, params = None):
+    """Typed, columnar variant of execSelect.
+
+    Dtypes come from cursor.description: numerics become float64/int64 and
+    timestamps datetime64 (timestamptz as UTC), converted one column at a time instead of per cell.
+    Returns a pandas DataFrame, or a dict of column name -> numpy array when
+    asFrame is False.
+    """
+    with queryStats.timed(query, type) as t:
+        with transaction(type) as cur:
+            t.mark("connect")
+            cur.execute(query, params or (None if type == "PostgreSql" else ()))
+            t.mark("execute")
+            description = cur.description
+            rows = cur.fetchall()
+
+        names = [d[0] for d in description]
+        columns = list(zip(*rows)) if rows else [()] * len(names)
+        data = {
+            name: _toArray(list(values), _columnKind(d[1], type))
+            for name, d, values in zip(names, description, columns)
+        }
+        t.mark("fetch")
+        t.timing.rows = len(rows)
+    return pd.DataFrame(data, columns=names) if asFrame else data
+
+
+STOCK_PRICE_COLUMNS = ["stock_id", "date", "open", "high", "low", "close", "volume"]
+
+upsertStockPriceSql = """
+    INSERT INTO stockPrice (stock_id, date, "open", "high", "low", "close", "volume")
+    SELECT DISTINCT ON (stock_id, date)
+           stock_id, date, "open", "high", "low", "close", "volume"
+    FROM stockPrice_stage
+    ORDER BY stock_id, date
+    ON CONFLICT (stock_id, date)
+    DO UPDATE SET
+        open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        volume = EXCLUDED.volume;
+"""
+
+
+def upsertStockPrice(df, symbol=None, chunkRows=200_000):
+    """Bulk upsert bars from alphavantage.fetch_data into stockPrice (PostgreSql).
+
+    Rows are streamed with COPY into a temp staging table and merged with a single
+    INSERT ... SELECT ... ON CONFLICT, all in one transaction. `df` is indexed by
+    timestamp; pass `symbol` for a single-ticker frame, or include a `stock_id`
+    column to load many tickers at once. Returns the number of rows merged.
+    """
+    if df.empty:
+        return 0
+
+    frame = df.rename_axis("date").reset_index()
+    if symbol is not None:
+        frame["stock_id"] = symbol
+    elif "stock_id" not in frame.columns:
+        raise ValueError("upsertStockPrice needs a symbol or a stock_id column")
+    frame = frame[STOCK_PRICE_COLUMNS]
 
-        conn = pyodbc.connect(connSqlServerStr)
-        cursor = conn.cursor()
+    columns = ", ".join(f'"{c}"' for c in STOCK_PRICE_COLUMNS)
+    with queryStats.timed(upsertStockPriceSql, "PostgreSql") as t:
+        with transaction("PostgreSql") as cur:
+            t.mark("connect")
+            cur.execute("CREATE TEMP TABLE stockPrice_stage (LIKE stockPrice) ON COMMIT DROP")
 
-        # Execute SQL query
-        cursor.execute(query)
+            for start in range(0, len(frame), chunkRows):
+                buf = StringIO()
+                frame.iloc[start:start + chunkRows].to_csv(
+                    buf, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S")
+                buf.seek(0)
+                cur.copy_expert(f"COPY stockPrice_stage ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
 
-        # Fetch all results
-        rows = cursor.fetchall()
+            cur.execute(upsertStockPriceSql)
+            count = t.timing.rows = cur.rowcount
+        t.mark("execute")
 
-        # Print results
-        # for row in rows:
-        #     print(row)
+    invalidateQueryCache(["stockPrice"])
+    return count
 
-        # Close connection
-        cursor.close()
-        conn.close()
 
-        result = []
+def copyRows(table, columns, rows):
+    """Append `rows` (sequences matching `columns`) to a PostgreSql table with one COPY."""
+    if not rows:
+        return 0
+    buf = StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
 
-        for row in rows:
-            converted = []
-            for item in row:
-                if isinstance(item, datetime.datetime):
-                    converted.append(item.strftime("%Y-%m-%d"))  # or item.isoformat()
-                elif isinstance(item, Decimal):
-                    converted.append(float(item))  # or str(item) if you prefer string
-                else:
-                    converted.append(item)  # int, str, etc.
-            result.append(converted)
+    quoted = ", ".join(f'"{c}"' for c in columns)
+    statement = f"COPY {table} ({quoted}) FROM STDIN WITH (FORMAT csv)"
+    with queryStats.timed(statement, "PostgreSql") as t:
+        with transaction("PostgreSql") as cur:
+            t.mark("connect")
+            cur.copy_expert(statement, buf)
+            t.timing.rows = len(rows)
+        t.mark("execute")
 
-        return result
+    invalidateQueryCache([table])
+    return len(rows)
 
 
 # # Query data
@@ -0,0 +1,134 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+_readTables = re.compile(r"\b(?:from|join)\s+([\w\[\]\".]+)", re.IGNORECASE)
+_writeTables = re.compile(
+    r"\b(?:insert\s+into|(?<!do\s)update|delete\s+from|merge\s+into|truncate(?:\s+table)?|copy"
+    r"|alter\s+table|drop\s+table(?:\s+if\s+exists)?)\s+([\w\[\]\".]+)",
+    re.IGNORECASE)
+
+
+_spaces = re.compile(r"\s+")
+_quoted = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def normalizeSql(query):
+    """Collapse whitespace outside quoted literals/identifiers; case is kept."""
+    parts = _quoted.split(query.strip().rstrip(";").strip())
+    # odd positions are the quoted pieces, kept verbatim
+    return "".join(part if i % 2 else _spaces.sub(" ", part) for i, part in enumerate(parts)).strip()
+
+
+def paramsKey(params):
+    """Hashable, value-sensitive key for DB-API parameters (sequences, dicts, nested lists)."""
+    if not params:
+        return ""
+    return json.dumps(params, sort_keys=True, default=repr)
+
+
+def tableName(identifier):
+    """[stock].[dbo].[StockPriceDaily] / "stockPrice" / stockprice -> stockpricedaily / stockprice"""
+    last = identifier.split(".")[-1]
+    return last.strip('[]"').lower()
+
+
+def tablesRead(query):
+    return {tableName(t) for t in _readTables.findall(query)}
+
+
+def tablesWritten(query):
+    return {tableName(t) for t in _writeTables.findall(query)}
+
+
+class QueryCache:
+    """LRU + TTL cache of select results, invalidated by table name on writes.
+
+    Each table carries a generation bumped on invalidation; a read that overlapped
+    an invalidation of any table it reads is not stored (see generation()/put()).
+    """
+
+    def __init__(self, maxEntries=256, ttl=300.0):
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires, tables, rows)
+        self._lock = threading.Lock()
+        self._generations = {}          # table -> invalidation count
+        self._cleared = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.staleSkips = 0
+
+    @staticmethod
+    def key(query, params, type):
+        return (type, normalizeSql(query), paramsKey(params))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def generation(self, query):
+        """Token to take before running `query`; pass it to put() once the rows are in."""
+        tables = tablesRead(query)
+        with self._lock:
+            return self._cleared, tuple(sorted((t, self._generations.get(t, 0)) for t in tables))
+
+    def put(self, key, query, rows, generation=None):
+        with self._lock:
+            if generation is not None:
+                cleared, seen = generation
+                if cleared != self._cleared or any(self._generations.get(t, 0) != g for t, g in seen):
+                    # invalidated while the read was running: the rows may predate the write
+                    self.staleSkips += 1
+                    return
+            self._entries[key] = (time.monotonic() + self.ttl, tablesRead(query), rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxEntries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tables):
+        tables = {tableName(t) for t in tables}
+        if not tables:
+            return 0
+        with self._lock:
+            for t in tables:
+                self._generations[t] = self._generations.get(t, 0) + 1
+            stale = [k for k, (_, read, _) in self._entries.items() if read & tables]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._cleared += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.maxEntries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "staleSkips": self.staleSkips,
+            }
@@ -0,0 +1,137 @@
+import json
+import re
+import threading
+import time
+from collections import deque
+
+from queryCache import normalizeSql
+
+
+SLOW_QUERY_SECONDS = 1.0
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_inLists = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+def statementKey(query):
+    """Normalized statement for grouping: literals and IN/VALUES lists collapse to ?."""
+    return _inLists.sub("(?)", _literals.sub("?", normalizeSql(query))).lower()
+
+
+class _Aggregate:
+    __slots__ = ("calls", "errors", "rows", "connect", "execute", "fetch", "total", "max")
+
+    def __init__(self):
+        self.calls = self.errors = self.rows = 0
+        self.connect = self.execute = self.fetch = self.total = self.max = 0.0
+
+    def asDict(self):
+        d = {name: getattr(self, name) for name in self.__slots__}
+        d["mean"] = self.total / self.calls if self.calls else 0.0
+        return d
+
+
+class Timing:
+    """Phase timings for one statement; filled in by the DB helpers."""
+    __slots__ = ("connect", "execute", "fetch", "rows", "error")
+
+    def __init__(self):
+        self.connect = self.execute = self.fetch = 0.0
+        self.rows = 0
+        self.error = None
+
+
+class QueryStats:
+    """Per-statement timing aggregates plus a slow-query log."""
+
+    def __init__(self, slowThreshold=SLOW_QUERY_SECONDS, slowLogPath=None, keepSlow=1000):
+        self.slowThreshold = slowThreshold
+        self.slowLogPath = slowLogPath
+        self.slow = deque(maxlen=keepSlow)
+        self._byStatement = {}
+        self._lock = threading.Lock()
+
+    def timed(self, query, type):
+        return _TimedStatement(self, query, type)
+
+    def record(self, query, type, timing):
+        total = timing.connect + timing.execute + timing.fetch
+        key = (type, statementKey(query))
+        with self._lock:
+            agg = self._byStatement.get(key)
+            if agg is None:
+                agg = self._byStatement[key] = _Aggregate()
+            agg.calls += 1
+            agg.rows += max(timing.rows, 0)
+            agg.connect += timing.connect
+            agg.execute += timing.execute
+            agg.fetch += timing.fetch
+            agg.total += total
+            agg.max = max(agg.max, total)
+            if timing.error is not None:
+                agg.errors += 1
+
+        if total >= self.slowThreshold:
+            entry = {
+                "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "type": type,
+                "statement": key[1],
+                "total": total,
+                "connect": timing.connect,
+                "execute": timing.execute,
+                "fetch": timing.fetch,
+                "rows": timing.rows,
+                "error": timing.error,
+            }
+            self.slow.append(entry)
+            if self.slowLogPath:
+                with self._lock, open(self.slowLogPath, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+
+    def summary(self):
+        with self._lock:
+            items = [(k, agg.asDict()) for k, agg in self._byStatement.items()]
+        items.sort(key=lambda kv: kv[1]["total"], reverse=True)
+        return [{"type": type, "statement": stmt, **agg} for (type, stmt), agg in items]
+
+    def dumpJson(self, path=None):
+        data = json.dumps({"statements": self.summary(), "slow": list(self.slow)}, indent=2, default=str)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(data)
+        return data
+
+    def reset(self):
+        with self._lock:
+            self._byStatement.clear()
+            self.slow.clear()
+
+
+class _TimedStatement:
+    """Context manager handing out a Timing; `mark()` closes the current phase."""
+
+    def __init__(self, stats, query, type):
+        self.stats = stats
+        self.query = query
+        self.type = type
+        self.timing = Timing()
+
+    def __enter__(self):
+        self._last = time.perf_counter()
+        return self
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        setattr(self.timing, phase, getattr(self.timing, phase) + now - self._last)
+        self._last = now
+
+    def resume(self):
+        """Restart the clock without charging the gap to any phase."""
+        self._last = time.perf_counter()
+
+    def __exit__(self, excType, exc, tb):
+        # GeneratorExit: a consumer closed execSelectChunks early, which is not a failure
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.timing.error = f"{excType.__name__}: {exc}"
+        self.stats.record(self.query, self.type, self.timing)
+        return False
@@ -1,24 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+
 import pandas as pd
 import matplotlib.pyplot as plt
+from statsmodels.tsa.seasonal import seasonal_decompose
 
 
-df = pd.read_csv(r'PatternAnalysis.csv')
+PERIOD = 12
+GROUPS_PER_TASK = 200       # series sent to a worker at a time; amortizes pickling
 
-print(df.head())
 
-from statsmodels.tsa.seasonal import seasonal_decompose
+def load(path=r'PatternAnalysis.csv'):
+    df = pd.read_csv(path)
+    df['date'] = pd.to_datetime(df[['year', 'month']].assign(day=1))
+    return df
+
+
+def decompose(ts, period=PERIOD, model='additive'):
+    """seasonal_decompose on a month-start series plus seasonal/trend strength (Hyndman's F_S, F_T)."""
+    result = seasonal_decompose(ts, model=model, period=period)
+    resid = result.resid.dropna()
+    detrended = (result.seasonal + result.resid).dropna()
+    deseasoned = (result.trend + result.resid).dropna()
+    metrics = {
+        'n': len(ts),
+        'seasonal_strength': max(0.0, 1 - resid.var() / detrended.var()) if detrended.var() > 0 else 0.0,
+        'trend_strength': max(0.0, 1 - resid.var() / deseasoned.var()) if deseasoned.var() > 0 else 0.0,
+        'seasonal_amplitude': float(result.seasonal.max() - result.seasonal.min()),
+    }
+    return result, metrics
+
+
+def _decomposeGroups(items, keys, period, model):
+    components, metrics, skipped = [], [], []
+    for key, dates, quantity in items:
+        key = key if isinstance(key, tuple) else (key,)
+        ts = pd.Series(quantity, index=pd.DatetimeIndex(dates)).asfreq('MS', fill_value=0)
+        if len(ts) < 2 * period:
+            skipped.append(key)
+            continue
+        try:
+            result, m = decompose(ts, period, model)
+        except ValueError:
+            # e.g. a zero month under model='multiplicative'; one bad series shouldn't sink the batch
+            skipped.append(key)
+            continue
+        frame = pd.DataFrame({'date': ts.index, 'observed': ts.values, 'trend': result.trend.values,
+                              'seasonal': result.seasonal.values, 'resid': result.resid.values})
+        for k, v in zip(keys, key):
+            frame.insert(0, k, v)
+            m[k] = v
+        components.append(frame)
+        metrics.append(m)
+    return components, metrics, skipped
+
+
+def decomposeAll(df, keys=('Product_Name',), period=PERIOD, model='additive', workers=None):
+    """Decompose every series in `df` grouped by `keys` (e.g. product, or product and region).
+
+    Monthly quantities are summed per group, missing months count as 0, and series
+    shorter than two periods or that can't be decomposed (zeros under
+    model='multiplicative') are skipped. Returns (components, metrics, skipped).
+    """
+    keys = list(keys)
+    monthly = df.groupby(keys + ['date'], sort=True, observed=True)['quantity'].sum().reset_index()
+    items = [(key, g['date'].to_numpy(), g['quantity'].to_numpy())
+             for key, g in monthly.groupby(keys if len(keys) > 1 else keys[0], sort=False, observed=True)]
+    tasks = [items[i:i + GROUPS_PER_TASK] for i in range(0, len(items), GROUPS_PER_TASK)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        results = [_decomposeGroups(t, keys, period, model) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_decomposeGroups, tasks, [keys] * len(tasks),
+                                    [period] * len(tasks), [model] * len(tasks)))
+
+    components = [c for r in results for c in r[0]]
+    metrics = pd.DataFrame([m for r in results for m in r[1]])
+    skipped = [s for r in results for s in r[2]]
+    components = pd.concat(components, ignore_index=True) if components else pd.DataFrame()
+    if not metrics.empty:
+        metrics = metrics[keys + [c for c in metrics.columns if c not in keys]]
+    return components, metrics, skipped
+
 
+def plot(df, product, period=PERIOD):
+    ts = df[df['Product_Name'] == product].groupby('date')['quantity'].sum().asfreq('MS', fill_value=0)
+    result, _ = decompose(ts, period)
+    result.plot()
+    plt.suptitle(f"Seasonal Decomposition of {product} Sales", fontsize=14)
+    plt.tight_layout()
+    plt.show()
 
-df['date'] = pd.to_datetime(df[['year', 'month']].assign(day=1))
-df.set_index('date', inplace=True)
 
-df_motor_oil = df[df['Product_Name'] == 'Motor Oil']
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Seasonal decomposition of every product's sales")
+    parser.add_argument('--input', default='PatternAnalysis.csv')
+    parser.add_argument('--by', nargs='+', default=['Product_Name'], help="grouping columns, e.g. Product_Name Region")
+    parser.add_argument('--output', default='seasonal_components.parquet')
+    parser.add_argument('--metrics', default='seasonal_metrics.parquet')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--plot', nargs='*', metavar='PRODUCT', help="plot these products (e.g. 'Motor Oil')")
+    args = parser.parse_args()
 
-ts = df_motor_oil['quantity'].asfreq('MS')  
+    df = load(args.input)
+    print(df.head())
 
-result = seasonal_decompose(ts, model='additive', period=12)
+    components, metrics, skipped = decomposeAll(df, args.by, workers=args.workers)
+    components.to_parquet(args.output, index=False)
+    metrics.to_parquet(args.metrics, index=False)
+    print(f"{len(metrics)} series decomposed, {len(skipped)} skipped (too short or not decomposable)")
+    if not metrics.empty:
+        print(metrics.sort_values('seasonal_strength', ascending=False).head(10))
 
-result.plot()
-plt.suptitle("Seasonal Decomposition of Motor Oil Sales", fontsize=14)
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+    for product in args.plot or []:
+        plot(df, product)
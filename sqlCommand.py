@@ -54,11 +54,15 @@ CreateCashflow = """        CREATE TABLE IF NOT EXISTS cashflow  (
             "Depreciation_Amortization_Depletion" NUMERIC,
             "Depreciation_And_Amortization" NUMERIC,
             "Net_Income_From_Continuing_Operations" NUMERIC,
+            filing_date DATE,
             PRIMARY KEY (stock_id, date)     
 
         );
     """
 
+# existing cashflow tables predate filing_date
+AddCashflowFilingDate = "ALTER TABLE cashflow ADD COLUMN IF NOT EXISTS filing_date DATE"
+
 
 createStockPrice = """        CREATE TABLE IF NOT EXISTS stockPrice  (
             stock_id TEXT,
@@ -85,7 +89,8 @@ createStockPrice = """        CREATE TABLE IF NOT EXISTS stockPrice  (
         );
     """
 createMacro = """ CREATE TABLE IF NOT EXISTS MacroMonthly  (
-                    'FEDFUNDS'      NUMERIC(10, 4)     -- Federal Funds Rate   -- Daily, lag one day
+                    date            DATE PRIMARY KEY   -- first day of the month
+                    ,"FEDFUNDS"     NUMERIC(10, 4)     -- Federal Funds Rate   -- Daily, lag one day
                     ,"MORTGAGE30US" NUMERIC(10, 4) -- Mortgage rates
                     ,"GS10"         NUMERIC(10, 4) -- 10-Year Treasury
 
@@ -106,4 +111,62 @@ createMacro = """ CREATE TABLE IF NOT EXISTS MacroMonthly  (
                     ,"HOUST"        NUMERIC(10, 4) -- New Housing Starts
                     ,"CSUSHPISA"    NUMERIC(10, 4) -- Home Price Index
                 )
-            """
\ No newline at end of file
+            """
+
+# Month-range partitioned variant of stockPrice. Partitions are named stockprice_pYYYY_MM
+# and managed by stockPartitions.py; rows outside every partition land in stockprice_default.
+createStockPricePartitioned = """        CREATE TABLE IF NOT EXISTS stockPrice  (
+            stock_id TEXT,
+            date timestamp,
+            "open" NUMERIC,
+            "high" NUMERIC,
+            "low" NUMERIC,
+            "close" NUMERIC,
+            "volume" NUMERIC,
+            PRIMARY KEY (stock_id, date)
+        ) PARTITION BY RANGE (date);
+
+        CREATE TABLE IF NOT EXISTS stockPrice_default PARTITION OF stockPrice DEFAULT;
+
+        CREATE INDEX IF NOT EXISTS stockPrice_date_brin ON stockPrice USING BRIN (date);
+    """
+
+
+# One row per symbol per pipeline run: the watermark it started from, where it ended, and row counts
+createIngestRun = """        CREATE TABLE IF NOT EXISTS ingestRun  (
+            run_id BIGSERIAL PRIMARY KEY,
+            stock_id TEXT,
+            started_at timestamp,
+            finished_at timestamp,
+            watermark_before timestamp,
+            watermark_after timestamp,
+            rows_fetched INTEGER,
+            rows_loaded INTEGER
+        );
+    """
+
+
+# Tick tables fed by API/polygonStream.py; append-only, so BRIN on time instead of a primary key
+createStockTrade = """        CREATE TABLE IF NOT EXISTS stockTrade  (
+            stock_id TEXT,
+            ts timestamp,
+            "price" NUMERIC,
+            "size" NUMERIC,
+            "exchange" INTEGER,
+            trade_id TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS stockTrade_ts_brin ON stockTrade USING BRIN (ts);
+    """
+
+createStockQuote = """        CREATE TABLE IF NOT EXISTS stockQuote  (
+            stock_id TEXT,
+            ts timestamp,
+            "bid" NUMERIC,
+            "bid_size" NUMERIC,
+            "ask" NUMERIC,
+            "ask_size" NUMERIC
+        );
+
+        CREATE INDEX IF NOT EXISTS stockQuote_ts_brin ON stockQuote USING BRIN (ts);
+    """
@@ -0,0 +1,145 @@
+import datetime
+
+from postgresql import transaction, execSelect, execSql, invalidateQueryCache
+from sqlCommand import createStockPricePartitioned
+
+TABLE = "stockprice"            # postgres folds the unquoted stockPrice to lower case
+ARCHIVE_SCHEMA = "archive"
+
+
+def monthStart(d):
+    return datetime.date(d.year, d.month, 1)
+
+
+def addMonths(d, n):
+    months = d.year * 12 + d.month - 1 + n
+    return datetime.date(months // 12, months % 12 + 1, 1)
+
+
+def partitionName(month):
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def _catalog(query):
+    # straight to the pool, never through the query cache: DDL doesn't invalidate catalog reads
+    with transaction("PostgreSql") as cur:
+        cur.execute(query)
+        return cur.fetchall()
+
+
+def tableKind():
+    """'p' for a partitioned stockPrice, 'r' for a plain table, None if it doesn't exist."""
+    rows = _catalog(f"SELECT relkind FROM pg_class WHERE relname = '{TABLE}' AND relkind IN ('r', 'p')")
+    return rows[0][0] if rows else None
+
+
+def isPartitioned():
+    return tableKind() == "p"
+
+
+def listPartitions():
+    """Return {partition name: month} for the monthly partitions currently attached."""
+    rows = _catalog(f"""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = '{TABLE}' AND c.relname LIKE '{TABLE}\\_p%'
+    """)
+    parts = {}
+    for (name,) in rows:
+        year, month = name.rsplit("_p", 1)[1].split("_")
+        parts[name] = datetime.date(int(year), int(month), 1)
+    return parts
+
+
+def ensureStockPricePartitions(start=None, monthsAhead=3):
+    """Create monthly partitions from `start` (default: this month) through `monthsAhead` months out.
+
+    No-op when stockPrice is a plain (unpartitioned) table. Rows already sitting in
+    the default partition for a new month are moved into it.
+    """
+    if not isPartitioned():
+        return []
+
+    today = datetime.date.today()
+    first = monthStart(start or today)
+    last = addMonths(monthStart(today), monthsAhead)
+    existing = listPartitions()
+
+    created = []
+    month = first
+    while month <= last:
+        name = partitionName(month)
+        if name not in existing:
+            nextMonth = addMonths(month, 1)
+            with transaction("PostgreSql") as cur:
+                cur.execute(f"""SELECT 1 FROM {TABLE}_default WHERE date >= %s AND date < %s LIMIT 1""",
+                            (month, nextMonth))
+                if cur.fetchone() is None:
+                    cur.execute(f"""CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE}
+                                    FOR VALUES FROM ('{month}') TO ('{nextMonth}')""")
+                else:
+                    # a new range can't overlap rows parked in the default partition: move them first
+                    cur.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {TABLE}_default")
+                    cur.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+                    cur.execute(f"""WITH moved AS (DELETE FROM {TABLE}_default
+                                                   WHERE date >= %s AND date < %s RETURNING *)
+                                    INSERT INTO {name} SELECT * FROM moved""", (month, nextMonth))
+                    cur.execute(f"""ALTER TABLE {TABLE} ATTACH PARTITION {name}
+                                    FOR VALUES FROM ('{month}') TO ('{nextMonth}')""")
+                    cur.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {TABLE}_default DEFAULT")
+            created.append(name)
+        month = addMonths(month, 1)
+    return created
+
+
+def detachOldPartitions(retainMonths=24, archive=True):
+    """Detach partitions older than `retainMonths`.
+
+    With archive=True they are moved to the `archive` schema (still queryable, no
+    longer scanned by stockPrice); otherwise they are dropped.
+    """
+    cutoff = addMonths(monthStart(datetime.date.today()), -retainMonths)
+    old = sorted(name for name, month in listPartitions().items() if month < cutoff)
+
+    for name in old:
+        with transaction("PostgreSql") as cur:
+            cur.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            if archive:
+                cur.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+                cur.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+            else:
+                cur.execute(f"DROP TABLE {name}")
+    if old:
+        invalidateQueryCache([TABLE])
+    return old
+
+
+def migrateToPartitioned():
+    """One-off: rebuild an unpartitioned stockPrice as the partitioned layout, keeping its rows."""
+    kind = tableKind()
+    if kind == "p":
+        return
+    if kind is None:
+        execSql(createStockPricePartitioned, type="PostgreSql")
+        ensureStockPricePartitions()
+        return
+
+    bounds = execSelect(f"SELECT min(date), max(date) FROM {TABLE}", "PostgreSql")[0]
+    with transaction("PostgreSql") as cur:
+        cur.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_legacy")
+        cur.execute(f"ALTER TABLE {TABLE}_legacy RENAME CONSTRAINT {TABLE}_pkey TO {TABLE}_legacy_pkey")
+        cur.execute(createStockPricePartitioned)
+
+    ensureStockPricePartitions(start=bounds[0])
+    with transaction("PostgreSql") as cur:
+        cur.execute(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_legacy")
+        cur.execute(f"DROP TABLE {TABLE}_legacy")
+    invalidateQueryCache([TABLE])
+
+
+if __name__ == '__main__':
+    # run from the scheduler, e.g. daily
+    print("created:", ensureStockPricePartitions(monthsAhead=3))
+    print("archived:", detachOldPartitions(retainMonths=24))
@@ -1,35 +1,66 @@
 import pandas as pd
-from postgresql import execSelect, execSql
-from config import connSqlServer
-from decimal import Decimal
-from datetime import datetime
-
-df = pd.read_csv(r'C:\\Users\\dwade\\Downloads\\aapl.csv')
-
-print(df.head())
-
-
-for idx, row in df.iterrows():
-    
-    query = f"""INSERT INTO [stock].[dbo].[StockPriceDaily] values (?,?, ?, ?, ?, ?, ?, ?)"""
-    
-    try:
-        values = ("AAPL", 
-            row['Date'],    
-            str(Decimal(row['open'])),        
-            str(Decimal(row['high'])),        
-            str(Decimal(row['low'])),        
-            str(Decimal(row['close'])),        
-            str(Decimal(row['adjClose'])),        
-            int(row['volume'].replace(",",""))                
-        )    
-        
-        print(query)
-
-        execSql(query, values, "SqlServer")
-    except:
-        pass # for those divident
-
-
-print(execSelect("""SELECT *
-                      FROM [stock].[dbo].[StockPriceDaily]""", "SqlServer"))
\ No newline at end of file
+from postgresql import execSelect, transaction, invalidateQueryCache
+import time
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'adjClose']
+
+insertDailySql = """INSERT INTO [stock].[dbo].[StockPriceDaily] values (?,?, ?, ?, ?, ?, ?, ?)"""
+
+
+def cleanDailyPrices(df, symbol):
+    """Type the whole frame column-wise.
+
+    Returns (prices, others): `prices` holds fully numeric bar rows ready for
+    insert, `others` holds rows that are not price bars (dividends, splits, ...).
+    """
+    out = pd.DataFrame({'stock_id': symbol, 'Date': pd.to_datetime(df['Date'], errors='coerce')})
+    for col in PRICE_COLUMNS:
+        out[col] = pd.to_numeric(df[col], errors='coerce')
+    out['volume'] = pd.to_numeric(df['volume'].astype(str).str.replace(',', '', regex=False), errors='coerce')
+
+    isPrice = out[['Date'] + PRICE_COLUMNS + ['volume']].notna().all(axis=1)
+    prices = out[isPrice].astype({'volume': 'int64'})
+    others = df[~isPrice]
+    return prices, others
+
+
+def loadStockPriceDaily(prices, batchSize=10_000):
+    """Insert cleaned rows into StockPriceDaily with fast_executemany, one transaction per batch."""
+    columns = ['stock_id', 'Date'] + PRICE_COLUMNS + ['volume']
+    frame = prices[columns].astype(object)
+    # to_pydatetime() returns a freshly indexed Series in pandas 3 and `prices` has gaps
+    # where non-price rows were dropped, so realign on prices' own index
+    frame['Date'] = pd.Series(prices['Date'].dt.to_pydatetime().tolist(), index=prices.index, dtype=object)
+
+    start = time.perf_counter()
+    for begin in range(0, len(frame), batchSize):
+        batch = frame.iloc[begin:begin + batchSize]
+        params = list(batch.itertuples(index=False, name=None))
+        with transaction("SqlServer") as cursor:
+            cursor.fast_executemany = True
+            cursor.executemany(insertDailySql, params)
+    invalidateQueryCache(["StockPriceDaily"])
+    elapsed = time.perf_counter() - start
+
+    rate = len(frame) / elapsed if elapsed > 0 else float('inf')
+    print(f"Inserted {len(frame)} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return len(frame)
+
+
+if __name__ == '__main__':
+    path = r'C:\\Users\\dwade\\Downloads\\aapl.csv'
+    df = pd.read_csv(path)
+
+    print(df.head())
+
+    prices, others = cleanDailyPrices(df, "AAPL")
+    if not others.empty:
+        # dividends and other non-price rows go to their own file instead of being dropped
+        othersPath = path.replace('.csv', '_nonprice.csv')
+        others.to_csv(othersPath, index=False)
+        print(f"{len(others)} non-price rows written to {othersPath}")
+
+    loadStockPriceDaily(prices)
+
+    print(execSelect("""SELECT *
+                          FROM [stock].[dbo].[StockPriceDaily]""", "SqlServer"))
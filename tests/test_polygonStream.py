@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+
+import pytest
+
+pytest.importorskip("websockets")
+pytest.importorskip("psycopg2")
+pytest.importorskip("pyodbc")
+pytest.importorskip("config")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "API"))
+import polygonStream  # noqa: E402
+
+
+def freePort():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def recordFeed(path, frames=40, perFrame=50):
+    """frames * perFrame * 2 events: one trade and one quote per tick, for AAPL and MSFT."""
+    t = 1_700_000_000_000
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(frames):
+            events = []
+            for j in range(perFrame // 2):
+                for sym in ("AAPL", "MSFT"):
+                    t += 1
+                    events.append({"ev": "T", "sym": sym, "t": t, "p": 100.0 + j, "s": 10, "x": 4, "i": f"{i}-{j}"})
+                    events.append({"ev": "Q", "sym": sym, "t": t, "bp": 99.9, "bs": 1, "ap": 100.1, "as": 2})
+            f.write(json.dumps(events) + "\n")
+    return frames * perFrame * 2
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    rows = {"stockTrade": [], "stockQuote": []}
+
+    def copyRows(table, columns, batch):
+        rows[table].extend(batch)
+        return len(batch)
+
+    monkeypatch.setattr(polygonStream, "execSql", lambda *a, **k: None)
+    monkeypatch.setattr(polygonStream, "copyRows", copyRows)
+    monkeypatch.setattr(polygonStream, "RECONNECT_SECONDS", 0.05)
+    return rows
+
+
+def runAgainst(serve, symbols, **kwargs):
+    async def main():
+        server = asyncio.create_task(serve)
+        await asyncio.sleep(0.2)
+        try:
+            return await asyncio.wait_for(polygonStream.stream(symbols, **kwargs), 30)
+        finally:
+            server.cancel()
+
+    return asyncio.run(main())
+
+
+def test_replay_is_written_in_full(tmp_path, captured):
+    path = tmp_path / "feed.jsonl"
+    expected = recordFeed(path)
+    port = freePort()
+
+    summary = runAgainst(polygonStream.serveReplay(str(path), port=port), ["AAPL", "MSFT"],
+                         url=f"ws://localhost:{port}", reconnect=False, maxRows=500, maxSeconds=0.1)
+
+    assert summary["events"] == expected
+    assert summary["written"] == expected
+    assert summary["failedBatches"] == 0
+    assert len(captured["stockTrade"]) == len(captured["stockQuote"]) == expected // 2
+    assert {row[0] for row in captured["stockTrade"]} == {"AAPL", "MSFT"}
+
+
+def test_replay_filters_unsubscribed_symbols(tmp_path, captured):
+    path = tmp_path / "feed.jsonl"
+    expected = recordFeed(path)
+    port = freePort()
+
+    summary = runAgainst(polygonStream.serveReplay(str(path), port=port), ["AAPL"],
+                         url=f"ws://localhost:{port}", reconnect=False, maxSeconds=0.1)
+
+    assert summary["written"] == expected // 2
+    assert {row[0] for row in captured["stockQuote"]} == {"AAPL"}
+
+
+def test_malformed_frames_are_skipped(captured):
+    import websockets
+    port = freePort()
+
+    async def serve():
+        async def handler(ws, *_):
+            await ws.recv()
+            await ws.recv()
+            await ws.send("not json")
+            await ws.send(json.dumps({"ev": "T"}))
+            await ws.send(json.dumps([{"ev": "T", "sym": "AAPL", "t": 1_700_000_000_000, "p": 1.0}]))
+            await ws.close()
+
+        async with websockets.serve(handler, "localhost", port):
+            await asyncio.Future()
+
+    summary = runAgainst(serve(), ["AAPL"], url=f"ws://localhost:{port}", reconnect=False, maxSeconds=0.1)
+
+    assert summary["written"] == 1
+
+
+def test_auth_failure_stops_reconnecting(captured):
+    import websockets
+    port = freePort()
+    connections = []
+
+    async def serve():
+        async def handler(ws, *_):
+            connections.append(ws)
+            await ws.recv()
+            await ws.send(json.dumps([{"ev": "status", "status": "auth_failed", "message": "bad key"}]))
+            await ws.wait_closed()
+
+        async with websockets.serve(handler, "localhost", port):
+            await asyncio.Future()
+
+    with pytest.raises(polygonStream.AuthFailed):
+        runAgainst(serve(), ["AAPL"], url=f"ws://localhost:{port}", reconnect=True)
+    assert len(connections) == 1
+
+
+def test_rejected_handshake_reconnects(captured):
+    import websockets
+    from http import HTTPStatus
+    port = freePort()
+    attempts = []
+
+    async def serve():
+        def reject(connection, request):
+            # the gateway answers the first attempt with a 503 instead of upgrading
+            attempts.append(request.path)
+            if len(attempts) == 1:
+                return connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "try again\n")
+
+        async def handler(ws, *_):
+            await ws.recv()
+            await ws.recv()
+            await ws.send(json.dumps([{"ev": "T", "sym": "AAPL", "t": 1_700_000_000_000, "p": 1.0}]))
+            await ws.wait_closed()
+
+        async with websockets.serve(handler, "localhost", port, process_request=reject):
+            await asyncio.Future()
+
+    async def main():
+        server = asyncio.create_task(serve())
+        await asyncio.sleep(0.2)
+        task = asyncio.create_task(polygonStream.stream(["AAPL"], url=f"ws://localhost:{port}", maxSeconds=0.1))
+        try:
+            # reconnect=True never returns on its own; stop once the retry has delivered the trade
+            for _ in range(100):
+                await asyncio.sleep(0.1)
+                if captured["stockTrade"] or task.done():
+                    break
+            assert not task.done(), "stream() ended on a rejected handshake"
+        finally:
+            task.cancel()
+            server.cancel()
+            await asyncio.gather(task, server, return_exceptions=True)
+
+    asyncio.run(main())
+    assert len(attempts) == 2
+    assert len(captured["stockTrade"]) == 1
@@ -0,0 +1,168 @@
+import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+
+FIRST_YEAR = 1990
+LAST_YEAR = 2040
+
+# Unscheduled full-day closures (weather, national days of mourning, 9/11)
+NYSE_SPECIAL_CLOSURES = [
+    "2001-09-11", "2001-09-12", "2001-09-13", "2001-09-14",
+    "2004-06-11", "2007-01-02", "2012-10-29", "2012-10-30",
+    "2018-12-05", "2025-01-09",
+]
+
+
+def _easter(year):
+    # anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def _nthWeekday(year, month, weekday, n):
+    """n-th `weekday` (Mon=0) of the month; n=-1 for the last one."""
+    if n > 0:
+        first = datetime.date(year, month, 1)
+        return first + datetime.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)
+    return last - datetime.timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    if day.weekday() == 5:
+        return day - datetime.timedelta(days=1)
+    if day.weekday() == 6:
+        return day + datetime.timedelta(days=1)
+    return day
+
+
+def nyseHolidays(year):
+    days = []
+    newYear = datetime.date(year, 1, 1)
+    if newYear.weekday() != 5:  # NYSE doesn't close the Friday before a Saturday New Year's Day
+        days.append(_observed(newYear))
+    if year >= 1998:
+        days.append(_nthWeekday(year, 1, 0, 3))            # Martin Luther King Jr. Day
+    days.append(_nthWeekday(year, 2, 0, 3))                # Washington's Birthday
+    days.append(_easter(year) - datetime.timedelta(days=2))  # Good Friday
+    days.append(_nthWeekday(year, 5, 0, -1))               # Memorial Day
+    if year >= 2022:
+        days.append(_observed(datetime.date(year, 6, 19)))  # Juneteenth
+    days.append(_observed(datetime.date(year, 7, 4)))      # Independence Day
+    days.append(_nthWeekday(year, 9, 0, 1))                # Labor Day
+    days.append(_nthWeekday(year, 11, 3, 4))               # Thanksgiving
+    days.append(_observed(datetime.date(year, 12, 25)))    # Christmas
+    return days
+
+
+def nyseEarlyCloses(year):
+    days = []
+    july3 = datetime.date(year, 7, 3)
+    if july3.weekday() < 4:
+        days.append(july3)
+    days.append(_nthWeekday(year, 11, 3, 4) + datetime.timedelta(days=1))  # day after Thanksgiving
+    christmasEve = datetime.date(year, 12, 24)
+    if christmasEve.weekday() < 4:
+        days.append(christmasEve)
+    return days
+
+
+class TradingCalendar:
+    """Precomputed session table for one exchange, with vectorized session lookups.
+
+    Every lookup accepts a scalar or an array of dates and is a searchsorted over
+    the sorted session array.
+    """
+
+    def __init__(self, name, tz, open, close, earlyClose, holidays, earlyCloses=(), weekmask="1111100"):
+        self.name = name
+        self.tz = ZoneInfo(tz)
+        self.open = open
+        self.close = close
+        self.earlyClose = earlyClose
+
+        start = np.datetime64(f"{FIRST_YEAR}-01-01")
+        end = np.datetime64(f"{LAST_YEAR + 1}-01-01")
+        self.holidays = np.unique(np.array(holidays, dtype="datetime64[D]"))
+        self.earlyCloses = np.unique(np.array(earlyCloses, dtype="datetime64[D]"))
+        self.sessions = np.arange(start, end, dtype="datetime64[D]")
+        self.sessions = self.sessions[np.is_busday(self.sessions, weekmask=weekmask, holidays=self.holidays)]
+        self.earlyCloses = self.earlyCloses[np.isin(self.earlyCloses, self.sessions)]
+
+    @staticmethod
+    def _days(dates):
+        if isinstance(dates, (str, datetime.date, np.datetime64)):
+            return np.datetime64(pd.Timestamp(dates).date(), "D")
+        return np.asarray(pd.to_datetime(dates).values, dtype="datetime64[D]")
+
+    @staticmethod
+    def _unwrap(result):
+        # scalars come back as datetime.date, arrays stay datetime64[D]
+        return pd.Timestamp(result).date() if np.ndim(result) == 0 else result
+
+    def isSession(self, dates):
+        days = self._days(dates)
+        i = np.searchsorted(self.sessions, days)
+        hit = (i < len(self.sessions)) & (self.sessions[np.minimum(i, len(self.sessions) - 1)] == days)
+        return bool(hit) if np.ndim(hit) == 0 else hit
+
+    def previousSession(self, dates, inclusive=False):
+        """Latest session before each date (on or before, if inclusive)."""
+        days = self._days(dates)
+        i = np.searchsorted(self.sessions, days, side="right" if inclusive else "left") - 1
+        if np.any(i < 0):
+            raise ValueError(f"{self.name} calendar has no session before {self.sessions[0]}")
+        return self._unwrap(self.sessions[i])
+
+    def nextSession(self, dates, inclusive=False):
+        """Earliest session after each date (on or after, if inclusive)."""
+        days = self._days(dates)
+        i = np.searchsorted(self.sessions, days, side="left" if inclusive else "right")
+        if np.any(i >= len(self.sessions)):
+            raise ValueError(f"{self.name} calendar has no session after {self.sessions[-1]}")
+        return self._unwrap(self.sessions[i])
+
+    def sessionsBetween(self, start, end):
+        """Sessions in [start, end] as datetime64[D]."""
+        lo = np.searchsorted(self.sessions, self._days(start), side="left")
+        hi = np.searchsorted(self.sessions, self._days(end), side="right")
+        return self.sessions[lo:hi]
+
+    def closeTime(self, day):
+        early = np.isin(self._days(day), self.earlyCloses)
+        return self.earlyClose if bool(early) else self.close
+
+    def lastCompletedSession(self, now=None):
+        """Most recent session whose close has passed, in exchange time."""
+        now = now.astimezone(self.tz) if now is not None else datetime.datetime.now(self.tz)
+        today = now.date()
+        if self.isSession(today) and now.time() >= self.closeTime(today):
+            return today
+        return self.previousSession(today)
+
+
+@lru_cache(maxsize=None)
+def getCalendar(name="XNYS"):
+    """Calendars we trade: XNYS (NYSE) and XNAS (Nasdaq) share the NYSE holiday schedule."""
+    if name in ("XNYS", "XNAS", "NYSE", "NASDAQ"):
+        years = range(FIRST_YEAR, LAST_YEAR + 1)
+        return TradingCalendar(
+            name, "America/New_York",
+            open=datetime.time(9, 30), close=datetime.time(16, 0), earlyClose=datetime.time(13, 0),
+            holidays=[d for y in years for d in nyseHolidays(y)] + NYSE_SPECIAL_CLOSURES,
+            earlyCloses=[d for y in years for d in nyseEarlyCloses(y)],
+        )
+    raise ValueError(f"no trading calendar for {name}")